@@ -1,9 +1,249 @@
+import copy
+import time
+from threading import Event
+
+from .distances import MAX_TABLE_CELLS, UNREACHABLE, DistanceTable, load_distance_table
+from .fields import FieldTable, distance_field
+from .hexmap import NO_CELL, CompiledMap
+from .metrics import Metrics
+from .openings import OpeningBook, load_book
+from .state import GameState
+
+
 class AIBase:
     """Interface for AI algorithms deciding on the next move."""
 
+    # Attributes holding caches derived from the map.  :meth:`fork` shares
+    # them between copies instead of duplicating them.
+    _SHARED = (
+        "_map_source",
+        "_compiled_map",
+        "_distance_table",
+        "_distance_table_map",
+        "_book",
+        "_book_map",
+        "metrics",
+        "_cancel",
+    )
+    # Attributes following the game from turn to turn, e.g. whether the flag
+    # is carried.  :meth:`adopt` takes them over from a fork.
+    _TURN_STATE: tuple = ()
+    # Whether a state reached the same way is always answered with the same
+    # move.  Only such models get opening books by default.
+    deterministic = True
+
     def __init__(self, team_color: str | None = None):
         self.team_color = team_color
+        self._map_source: dict | None = None
+        self._compiled_map: CompiledMap | None = None
+        self._distance_table: DistanceTable | FieldTable | None = None
+        self._distance_table_map: CompiledMap | None = None
+        self._book: OpeningBook | None = None
+        self._book_map: CompiledMap | None = None
+        # Search and cache statistics, see :meth:`collect_metrics`.
+        self.metrics = Metrics()
+        # Set on forks, see :meth:`fork`.
+        self._cancel: Event | None = None
+
+    @property
+    def name(self) -> str:
+        """Name of the model, as listed in ``ALL_MODELS``."""
+        return type(self).__name__
+
+    def compiled_map(self, game_map: dict | CompiledMap) -> CompiledMap:
+        """Return the compiled form of ``game_map``.
+
+        The map is static for a whole session, so the compiled representation
+        is built once and reused until a different map payload is seen.
+        ``game_map`` may also already be a :class:`CompiledMap`.
+        """
+        if isinstance(game_map, CompiledMap):
+            self._map_source = None
+            self._compiled_map = game_map
+            return game_map
+        source = self._map_source
+        if game_map is not source:
+            if self._compiled_map is None or game_map != source:
+                self._compiled_map = CompiledMap.from_game_map(game_map)
+            # An equal payload is adopted so later calls with it only
+            # compare identities instead of whole maps.
+            self._map_source = game_map
+        return self._compiled_map
+
+    def distance_table(self, game_map: dict | CompiledMap) -> DistanceTable | FieldTable:
+        """Return the all-pairs distance table of ``game_map``.
+
+        Tables are persisted between sessions, see
+        :func:`~kyberna_ctf.distances.load_distance_table`.  Maps with more
+        than :data:`~kyberna_ctf.distances.MAX_TABLE_CELLS` open cells would
+        take seconds to build, so a :class:`~kyberna_ctf.fields.FieldTable`
+        answers the same queries there.
+        """
+        cmap = self.compiled_map(game_map)
+        if self._distance_table is None or self._distance_table_map is not cmap:
+            if cmap.size - cmap.passable.count(0) > MAX_TABLE_CELLS:
+                self._distance_table = FieldTable(cmap)
+            else:
+                self._distance_table = load_distance_table(cmap)
+            self._distance_table_map = cmap
+        return self._distance_table
+
+    def game_state(
+        self, game_map: dict | CompiledMap, entities: list | GameState, score: dict | None = None
+    ) -> GameState:
+        """Return ``entities`` as a :class:`GameState` seen by this AI's team.
+
+        A state already parsed for this team (e.g. by the session loop) is
+        returned as is; a raw entity list is parsed once.
+        """
+        if isinstance(entities, GameState):
+            if entities.team_color == self.team_color:
+                return entities
+            entities = entities.entities
+        width = self.compiled_map(game_map).width
+        return GameState.from_entities(entities, self.team_color, width, score)
+
+    def book_move(
+        self, game_map: dict | CompiledMap, entities: list | GameState, score: dict | None = None
+    ) -> int | None:
+        """Return the opening-book move for this state, if there is one.
+
+        Books are built by :mod:`kyberna_ctf.openings` and looked up by map
+        layout, model name and team.
+        """
+        cmap = self.compiled_map(game_map)
+        if self._book_map is not cmap:
+            self._book = load_book(cmap)
+            self._book_map = cmap
+        if self._book is None:
+            return None
+        move = self._book.lookup(self.name, self.team_color, self.game_state(cmap, entities, score))
+        self.metrics.cache("book", move is not None)
+        return move
+
+    def observe(
+        self, game_map: dict | CompiledMap, entities: list | GameState, score: dict | None = None
+    ) -> None:
+        """Update internal tracking for a turn decided without :meth:`choose_move`.
+
+        Models that follow the game across turns (e.g. whether they carry
+        the flag) override this.
+        """
+
+    def decide(
+        self,
+        game_map: dict | CompiledMap,
+        entities: list | GameState,
+        score: dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        """Return the opening-book move if available, else :meth:`choose_move`."""
+        move = self.book_move(game_map, entities, score)
+        if move is None:
+            return self.choose_move(game_map, entities, score, deadline)
+        self.observe(game_map, entities, score)
+        return move
+
+    def fork(self, cancel: Event | None = None) -> "AIBase":
+        """Return an independent copy for trying out hypothetical states.
+
+        Decisions taken by the copy do not affect this instance.  The caches
+        listed in ``_SHARED`` are shared rather than copied.  Once ``cancel``
+        is set, the copy's :meth:`out_of_time` reports its deadline as passed.
+        """
+        memo = {}
+        for attr in self._SHARED:
+            value = getattr(self, attr, None)
+            if value is not None:
+                memo[id(value)] = value
+        fork = copy.deepcopy(self, memo)
+        fork._cancel = cancel
+        return fork
+
+    def adopt(self, fork: "AIBase") -> None:
+        """Continue from ``fork`` after it decided the state actually reached.
+
+        Takes over the attributes listed in ``_TURN_STATE``; the caches in
+        ``_SHARED`` are already the same objects.
+        """
+        for attr in self._TURN_STATE:
+            setattr(self, attr, getattr(fork, attr))
+
+    def out_of_time(self, deadline: float | None) -> bool:
+        """Whether ``deadline`` (a :func:`time.perf_counter` value) has passed.
+
+        A cancelled fork is always out of time.
+        """
+        if self._cancel is not None and self._cancel.is_set():
+            return True
+        return deadline is not None and time.perf_counter() >= deadline
+
+    def fallback_move(self, game_map: dict | CompiledMap, entities: list | GameState) -> int:
+        """Return a cheap greedy move used when :meth:`choose_move` runs late.
+
+        Steps to the neighbour closest to an enemy flag, or to our base while
+        the flag is carried, according to one BFS distance field from those
+        targets.  The late :meth:`choose_move` may still be running on
+        another thread, so the model's caches are only read, never built or
+        replaced.
+        """
+        source, compiled = self._map_source, self._compiled_map
+        if isinstance(game_map, CompiledMap):
+            cmap = game_map
+        elif compiled is not None and game_map is source:
+            cmap = compiled
+        else:
+            cmap = CompiledMap.from_game_map(game_map)
+        state = entities
+        if not isinstance(state, GameState) or state.team_color != self.team_color:
+            if isinstance(state, GameState):
+                state = state.entities
+            state = GameState.from_entities(state, self.team_color, cmap.width)
+        if state.player == NO_CELL:
+            return 1
+        field = distance_field(cmap, state.enemy_flags or state.bases)
+        best = None
+        best_dist = UNREACHABLE
+        for direction, nxt in cmap.adjacency[state.player]:
+            if best is None:
+                best = direction
+            if field[nxt] < best_dist:
+                best, best_dist = direction, field[nxt]
+        return best if best is not None else 1
+
+    def describe(self) -> str:
+        """Return a one-line summary of the model's statistics, if it keeps any."""
+        return ""
+
+    def close(self) -> None:
+        """Release what the model holds beyond the game, e.g. helper processes.
+
+        Called once the model's game is over.  The default does nothing.
+        """
+
+    def collect_metrics(self) -> Metrics:
+        """Return the metrics the model recorded so far.
+
+        Forks share the metrics of the original, so work done on them (e.g.
+        speculative replies) is counted as well.
+        """
+        return self.metrics
+
+    def choose_move(
+        self,
+        game_map: dict,
+        entities: list,
+        score: dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        """Return the move direction (1-6) based on map, entities and score.
+
+        ``game_map`` is either the raw ``GameMap`` payload or a
+        :class:`~kyberna_ctf.hexmap.CompiledMap`; ``entities`` is either the
+        raw entity list or a :class:`~kyberna_ctf.state.GameState`.
 
-    def choose_move(self, game_map: dict, entities: list, score: dict | None = None) -> int:
-        """Return the move direction (1-6) based on map, entities and score."""
+        ``deadline`` is a soft time limit as a :func:`time.perf_counter`
+        value.  Models doing more than a constant amount of work check it with
+        :meth:`out_of_time` and return their best move found so far.
+        """
         raise NotImplementedError
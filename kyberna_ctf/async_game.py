@@ -0,0 +1,185 @@
+"""Asyncio session loop driving many AI games from one process.
+
+Every session is a coroutine sharing one :class:`AsyncClient` connection
+pool.  The CPU-bound ``choose_move`` calls run in a worker thread per
+session so a slow model never blocks the polling of the other sessions, and
+a move that overruns its budget is replaced by the model's fallback move.
+Everything else that may block (fallback moves, replay and metrics files,
+the results store) is handed to a thread as well.  Models run in-process by
+default, as a worker process per session would not scale to many games.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import aiohttp
+
+from .ai import AIBase
+from .async_network import AsyncClient
+from .game import DEFAULT_MOVE_BUDGET, _make_ai, _MoveGuard, _record_result, _select_map
+from .metrics import Metrics, recording, write_metrics
+from .models import ALL_MODELS
+from .polling import AdaptivePoller
+from .replay import ReplayWriter
+from .state import GameState
+
+
+async def play_session_async(
+    client: AsyncClient,
+    player_id: str,
+    session_id: str,
+    team_color: str,
+    map_name: str,
+    ai: AIBase,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+) -> None:
+    """Play one AI session until the game is over."""
+    tag = f"[{ai.name} {session_id}]"
+    started = time.perf_counter()
+    # Each session runs in its own task, so the recording does not leak into
+    # the other sessions.
+    with _MoveGuard(ai, move_budget) as guard, ReplayWriter(
+        map_name, team_color, ai.name, session_id
+    ) as replay, recording(Metrics()) as session_metrics:
+        # The map is static for the whole session.
+        game_map = None
+        poller = AdaptivePoller(metrics=session_metrics)
+        while True:
+            state = await client.get_state(player_id, session_id)
+
+            if state == "GameOver":
+                score = await client.get_score(player_id, session_id)
+                print(f"{tag} Game over, final score: {score}")
+                print(f"{tag} Polling: {poller.describe()}")
+                print(f"{tag} Moves: {await asyncio.to_thread(guard.describe)}")
+                if replay.turns:
+                    print(f"{tag} Replay saved to {replay.path}")
+                session_metrics.merge(await asyncio.to_thread(guard.collect_metrics))
+                print(f"{tag} Metrics:")
+                for line in session_metrics.summary():
+                    print(f"{tag}   {line}")
+                await asyncio.to_thread(
+                    write_metrics,
+                    session_metrics,
+                    session=session_id,
+                    map=map_name,
+                    team=team_color,
+                    model=ai.name,
+                    score=score,
+                )
+                await asyncio.to_thread(
+                    _record_result,
+                    ai.name,
+                    map_name,
+                    team_color,
+                    session_id,
+                    score,
+                    session_metrics,
+                    started,
+                )
+                return
+
+            if state != "Ready":
+                await asyncio.sleep(poller.next_interval())
+                continue
+
+            poller.ready()
+            guard.stop_speculation()
+
+            calls = [
+                client.get_entities(player_id, session_id),
+                client.get_score(player_id, session_id),
+            ]
+            if game_map is None:
+                calls.append(client.get_map(player_id, session_id))
+            entities, score, *fetched_map = await asyncio.gather(*calls)
+            if fetched_map:
+                game_map = fetched_map[0]
+            start = time.perf_counter()
+            state = GameState.from_entities(entities, team_color, game_map["width"], score)
+            direction = None
+            fallback = False
+            future = guard.submit(game_map, state, score)
+            if future is not None:
+                remaining = guard.budget - (time.perf_counter() - start)
+                try:
+                    direction = await asyncio.wait_for(
+                        asyncio.shield(asyncio.wrap_future(future)), remaining
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            if direction is None:
+                direction = await asyncio.to_thread(guard.fallback, game_map, state)
+                fallback = True
+            duration = time.perf_counter() - start
+            print(f"{tag} AI chose direction {direction} in {duration:.2f}s")
+            session_metrics.observe("decision_time", duration)
+            session_metrics.count("fallbacks", int(fallback))
+            await asyncio.to_thread(
+                replay.record, game_map, entities, score, int(direction), duration, fallback
+            )
+            try:
+                await client.send_move(player_id, session_id, int(direction))
+            except aiohttp.ClientError as exc:
+                print(f"{tag} Failed to send move: {exc}")
+            else:
+                poller.move_sent()
+                guard.speculate(
+                    game_map, state, score, int(direction), poller.expected_latency()
+                )
+                await asyncio.sleep(poller.next_interval())
+
+
+async def run_game_async(
+    client: AsyncClient,
+    player_id: str,
+    ai_name: str,
+    map_name: str,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+    worker: bool = False,
+    speculate: bool = False,
+) -> None:
+    """Create an AI session for ``ai_name`` and play it.
+
+    With ``worker`` the model runs in its own process instead of this one,
+    with ``speculate`` it prepares replies while the opponent thinks.
+    """
+    session_id, team_color = await client.create_session(player_id, map_name, session_type="Ai")
+    print(f"[{ai_name}] Session ID: {session_id}, Team Color: {team_color}")
+    # Starting and stopping a worker process blocks, e.g. on its join.
+    ai = await asyncio.to_thread(_make_ai, ALL_MODELS[ai_name], team_color, worker, speculate)
+    try:
+        await play_session_async(
+            client, player_id, session_id, team_color, map_name, ai, move_budget
+        )
+    finally:
+        await asyncio.to_thread(ai.close)
+
+
+async def run_games_async(
+    player_id: str,
+    ai_names: list[str],
+    map_name: str | None = None,
+    base_url: str | None = None,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+    worker: bool = False,
+    speculate: bool = False,
+) -> None:
+    """Run one session per entry of ``ai_names`` concurrently."""
+    if map_name is None:
+        map_name = _select_map(player_id)
+    async with AsyncClient(base_url) as client:
+        results = await asyncio.gather(
+            *(
+                run_game_async(
+                    client, player_id, name, map_name, move_budget, worker, speculate
+                )
+                for name in ai_names
+            ),
+            return_exceptions=True,
+        )
+    for name, result in zip(ai_names, results):
+        if isinstance(result, Exception):
+            print(f"[{name}] Session failed: {result!r}")
@@ -0,0 +1,116 @@
+"""Asynchronous HTTP client for the CTF server.
+
+:class:`AsyncClient` offers the same calls as :mod:`kyberna_ctf.network` as
+coroutines on top of a single ``aiohttp`` connection pool.  The pool is
+bounded in total and per host and keeps connections alive between requests so
+hundreds of sessions can be driven from one event loop.
+"""
+
+from __future__ import annotations
+
+import time
+
+import aiohttp
+
+from . import network
+from .metrics import record_rtt
+
+# Default bounds of the connection pool.
+POOL_LIMIT = 100
+POOL_LIMIT_PER_HOST = 50
+KEEPALIVE_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 10.0
+
+
+class AsyncClient:
+    """Pooled asynchronous client, use as ``async with AsyncClient() as c``."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        limit: int = POOL_LIMIT,
+        limit_per_host: int = POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> None:
+        self.base_url = (base_url or network.BASE_URL).rstrip("/")
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> "AsyncClient":
+        connector = aiohttp.TCPConnector(
+            limit=self._limit,
+            limit_per_host=self._limit_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self._timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _post(self, endpoint: str, payload: dict):
+        """Send a POST request and return the decoded JSON or text body.
+
+        The time until the response headers arrive is added to the current
+        session's metrics, if any.
+        """
+        if self._session is None:
+            raise RuntimeError("AsyncClient must be used as an async context manager.")
+        start = time.perf_counter()
+        async with self._session.post(f"{self.base_url}{endpoint}", json=payload) as resp:
+            record_rtt(endpoint, time.perf_counter() - start)
+            resp.raise_for_status()
+            if resp.content_type.endswith("json"):
+                return await resp.json()
+            text = await resp.text()
+            return text.strip()
+
+    # ------------------------------------------------------------------
+    # API calls
+    # ------------------------------------------------------------------
+    async def get_maps(self, player_id: str):
+        """Return a list of available map names."""
+        return await self._post("/Game/AllMaps", {"playerId": player_id})
+
+    async def create_session(self, player_id: str, map_name: str, session_type: str = "Manual"):
+        """Create a game session and return its id and team color."""
+        data = await self._post(
+            "/Game/CreateSession",
+            {"playerId": player_id, "mapName": map_name, "type": session_type},
+        )
+        return data["sessionId"], data["teamsColor"]
+
+    async def get_state(self, player_id: str, session_id: str):
+        """Fetch the current state of the game."""
+        return await self._post("/Game/State", {"playerId": player_id, "sessionId": session_id})
+
+    async def send_move(self, player_id: str, session_id: str, direction: int):
+        """Send a move to the server."""
+        return await self._post(
+            "/Game/Move",
+            {"playerId": player_id, "sessionId": session_id, "direction": direction},
+        )
+
+    async def get_map(self, player_id: str, session_id: str):
+        """Retrieve the current game map."""
+        return await self._post("/Game/Map", {"playerId": player_id, "sessionId": session_id})
+
+    async def get_entities(self, player_id: str, session_id: str):
+        """Retrieve all entities in the current session."""
+        return await self._post("/Game/Entities", {"playerId": player_id, "sessionId": session_id})
+
+    async def get_score(self, player_id: str, session_id: str):
+        """Retrieve the final score for the session."""
+        return await self._post("/Game/Score", {"playerId": player_id, "sessionId": session_id})
@@ -0,0 +1,319 @@
+"""Micro-benchmarks of the models and their search routines.
+
+The suite runs on fixed synthetic maps of several sizes, wall densities and
+layout styles (see :func:`~kyberna_ctf.maps.generate_map`), so the numbers
+of two runs are comparable.  It measures:
+
+* ``choose_move`` of every ``ALL_MODELS`` entry over one game against
+  :data:`OPPONENT`, together with the search statistics the model records
+  in its metrics (nodes expanded, rollouts, ...);
+* the routines behind them on seeded random positions:
+  ``RatioAI._distance_field`` and the ``_compute_intercept`` of both
+  intercept models.
+
+Distance tables are built before timing starts, so the numbers show the
+steady state of a session rather than its first turn.  Results are saved in
+:data:`BENCH_DIR` under the current git commit and can be compared with an
+earlier run::
+
+    python -m kyberna_ctf.benchmark
+    python -m kyberna_ctf.benchmark --models DijkstraAI --maps maze-l --compare 1a2b3c4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+from .fields import HAS_NUMPY
+from .maps import LocalMap, generate_map
+from .models import ALL_MODELS, DijkstraAI, InterceptAI, InterceptAI2, RatioAI
+from .rules import Match
+from .state import GameState
+
+# Directory receiving one result file per benchmarked commit.
+BENCH_DIR = Path("benchmarks")
+
+# Opponent of the models in the ``choose_move`` benchmark.
+OPPONENT = "DijkstraAI"
+# Turns played per model and map.
+DEFAULT_TURNS = 60
+# Random positions per routine and map.
+DEFAULT_SAMPLES = 200
+# Change of the median below which a comparison reports no difference.
+NOISE = 0.05
+
+
+class MapSpec(NamedTuple):
+    name: str
+    width: int
+    height: int
+    wall_density: float
+    style: str
+    seed: int
+
+    def build(self) -> LocalMap:
+        return generate_map(
+            self.name, self.width, self.height, self.wall_density, self.seed, self.style
+        )
+
+
+SUITE = [
+    MapSpec("open-s", 16, 12, 0.1, "random", 1),
+    MapSpec("random-m", 28, 20, 0.2, "random", 2),
+    MapSpec("random-l", 40, 30, 0.2, "random", 3),
+    MapSpec("dense-l", 40, 30, 0.35, "random", 4),
+    MapSpec("corridors-m", 28, 20, 0.1, "corridors", 5),
+    MapSpec("corridors-l", 40, 30, 0.1, "corridors", 6),
+    MapSpec("maze-m", 28, 20, 0.0, "maze", 7),
+    MapSpec("maze-l", 40, 30, 0.0, "maze", 8),
+]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _result(case: str, map_name: str, times: List[float], nodes: Dict[str, float]) -> Dict:
+    values = sorted(times)
+    return {
+        "case": case,
+        "map": map_name,
+        "n": len(values),
+        "mean": sum(values) / len(values),
+        "p50": _percentile(values, 0.5),
+        "p90": _percentile(values, 0.9),
+        "p99": _percentile(values, 0.99),
+        "max": values[-1],
+        # Mean search statistics per call, keyed by metric name.
+        "nodes": nodes,
+    }
+
+
+def _node_means(ai) -> Dict[str, float]:
+    return {name: hist.mean for name, hist in sorted(ai.metrics.histograms.items())}
+
+
+# ----------------------------------------------------------------------
+# Cases
+# ----------------------------------------------------------------------
+def bench_model(model: str, local_map: LocalMap, turns: int = DEFAULT_TURNS) -> Dict:
+    """Time ``choose_move`` of ``model`` playing Red for ``turns`` turns."""
+    match = Match(local_map, turns)
+    cmap = match.cmap
+    ai = ALL_MODELS[model](team_color="Red")
+    opponent = ALL_MODELS[OPPONENT](team_color="Blue")
+    ai.distance_table(cmap)
+    opponent.distance_table(cmap)
+    times = []
+    try:
+        while not match.over:
+            entities = match.entities()
+            score = match.score()
+            state = GameState.from_entities(entities, "Red", cmap.width, score)
+            start = time.perf_counter()
+            move = int(ai.choose_move(cmap, state, score))
+            times.append(time.perf_counter() - start)
+            state = GameState.from_entities(entities, "Blue", cmap.width, score)
+            match.step({"Red": move, "Blue": int(opponent.choose_move(cmap, state, score))})
+    finally:
+        ai.close()
+        opponent.close()
+    return _result(f"choose_move {model}", local_map.name, times, _node_means(ai))
+
+
+def _time_calls(calls: List[Callable[[], object]]) -> List[float]:
+    times = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_routines(local_map: LocalMap, samples: int = DEFAULT_SAMPLES, seed: int = 0) -> List[Dict]:
+    """Time the search routines on ``samples`` seeded random positions."""
+    dijkstra = DijkstraAI("Red")
+    cmap = dijkstra.compiled_map(local_map.game_map)
+    table = dijkstra.distance_table(cmap)
+    rnd = random.Random(seed)
+    cells = [i for i in range(cmap.size) if cmap.passable[i]]
+    pairs = []
+    while len(pairs) < samples:
+        a, b = rnd.choice(cells), rnd.choice(cells)
+        if a != b and table.distance(a, b) is not None:
+            pairs.append((cmap.coords(a), cmap.coords(b)))
+    enemy_bases = [
+        (e["location"]["x"], e["location"]["y"])
+        for e in local_map.entities
+        if e["type"] == "Base" and e["teamColor"] == "Blue"
+    ]
+    results = []
+
+    ratio = RatioAI("Red")
+    times = _time_calls([lambda a=a: ratio._distance_field(cmap, a) for a, _ in pairs])
+    results.append(_result("_distance_field", local_map.name, times, {}))
+
+    for cls in (InterceptAI, InterceptAI2):
+        ai = cls("Red")
+        ai.distance_table(cmap)
+        times = _time_calls(
+            [lambda a=a, b=b: ai._compute_intercept(cmap, a, b, enemy_bases) for a, b in pairs]
+        )
+        results.append(
+            _result(f"_compute_intercept {cls.__name__}", local_map.name, times, {})
+        )
+    return results
+
+
+# ----------------------------------------------------------------------
+# Storage and comparison
+# ----------------------------------------------------------------------
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def current_revision() -> str:
+    """Return the short commit id, with ``-dirty`` for uncommitted changes."""
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    if _git("status", "--porcelain", "--untracked-files=no"):
+        commit += "-dirty"
+    return commit
+
+
+def save_results(results: List[Dict], revision: str, directory: Path | None = None) -> Path:
+    path = (directory or BENCH_DIR) / f"{revision}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "revision": revision,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": HAS_NUMPY,
+        "results": results,
+    }
+    path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    return path
+
+
+def load_results(reference: str, directory: Path | None = None) -> Dict:
+    """Read the results saved for ``reference``, a revision or a file path."""
+    path = Path(reference)
+    if not path.exists():
+        path = (directory or BENCH_DIR) / f"{reference}.json"
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def describe_result(result: Dict) -> str:
+    nodes = ", ".join(f"{name} {value:,.0f}" for name, value in result["nodes"].items())
+    return (
+        f"{result['case']:<34} {result['map']:<12} {result['n']:>5} "
+        f"{result['mean'] * 1000:>8.3f} {result['p50'] * 1000:>8.3f} "
+        f"{result['p90'] * 1000:>8.3f} {result['p99'] * 1000:>8.3f}  {nodes}"
+    )
+
+
+def compare(results: List[Dict], reference: Dict) -> List[str]:
+    """Return one line per case present in both runs with the change of its median."""
+    before = {(r["case"], r["map"]): r for r in reference["results"]}
+    lines = []
+    for result in results:
+        old = before.get((result["case"], result["map"]))
+        if old is None or not old["p50"]:
+            continue
+        change = result["p50"] / old["p50"] - 1
+        verdict = "same" if abs(change) < NOISE else ("faster" if change < 0 else "slower")
+        lines.append(
+            f"{result['case']:<34} {result['map']:<12} "
+            f"{old['p50'] * 1000:>8.3f} -> {result['p50'] * 1000:>8.3f} ms "
+            f"{change:>+7.1%} {verdict}"
+        )
+    return lines
+
+
+def run_benchmark(
+    models: List[str],
+    specs: List[MapSpec],
+    turns: int = DEFAULT_TURNS,
+    samples: int = DEFAULT_SAMPLES,
+    routines: bool = True,
+) -> List[Dict]:
+    """Run the suite on ``specs`` and print one line per case."""
+    print(
+        f"{'Case':<34} {'Map':<12} {'Calls':>5} {'mean ms':>8} {'p50 ms':>8} "
+        f"{'p90 ms':>8} {'p99 ms':>8}  nodes/call"
+    )
+    results = []
+    for spec in specs:
+        local_map = spec.build()
+        cases = [bench_model(model, local_map, turns) for model in models]
+        if routines:
+            cases += bench_routines(local_map, samples, spec.seed)
+        for result in cases:
+            print(describe_result(result))
+        results += cases
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the AI models on synthetic maps")
+    parser.add_argument(
+        "--models",
+        default=",".join(ALL_MODELS),
+        help="Comma separated list of AI models (default: all)",
+    )
+    parser.add_argument(
+        "--maps",
+        help=f"Comma separated list of suite maps (default: {', '.join(s.name for s in SUITE)})",
+    )
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS, help="Turns per model and map")
+    parser.add_argument(
+        "--samples", type=int, default=DEFAULT_SAMPLES, help="Positions per routine and map"
+    )
+    parser.add_argument("--no-routines", action="store_true", help="Only benchmark choose_move")
+    parser.add_argument("--compare", help="Revision or result file to compare with")
+    parser.add_argument("--no-save", action="store_true", help=f"Do not write to {BENCH_DIR}/")
+    args = parser.parse_args()
+
+    models = [n.strip() for n in args.models.split(",") if n.strip()]
+    for name in models:
+        if name not in ALL_MODELS:
+            raise SystemExit(f"Unknown AI model: {name}")
+    specs = SUITE
+    if args.maps:
+        by_name = {spec.name: spec for spec in SUITE}
+        names = [n.strip() for n in args.maps.split(",") if n.strip()]
+        for name in names:
+            if name not in by_name:
+                raise SystemExit(f"Unknown benchmark map: {name}")
+        specs = [by_name[name] for name in names]
+    reference = None
+    if args.compare:
+        try:
+            reference = load_results(args.compare)
+        except (OSError, ValueError) as exc:
+            raise SystemExit(str(exc))
+
+    results = run_benchmark(models, specs, args.turns, args.samples, not args.no_routines)
+    if not args.no_save:
+        print(f"Results saved to {save_results(results, current_revision())}")
+    if reference is not None:
+        print(f"\nMedian compared with {reference['revision']}:")
+        for line in compare(results, reference):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
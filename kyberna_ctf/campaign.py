@@ -0,0 +1,182 @@
+"""Campaigns: every model on every map, unattended.
+
+A campaign plays ``games`` sessions of each model on each map.  Sessions
+run on a bounded thread pool; each one runs its model in a worker process
+like any other session.  A semaphore per server additionally caps how many
+sessions are open on one server at a time.  A failed session is retried
+after a growing delay, and so is a session that does not start or does not
+end in time, e.g. because the opponent never moves.
+
+Every finished session is appended to the campaign's progress file in
+:data:`CAMPAIGN_DIR`.  Starting a campaign of the same name again skips the
+sessions already played, so an interrupted campaign resumes where it
+stopped::
+
+    python main.py --campaign nightly --maps all --ais DijkstraAI,RatioAI --games 3
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Set
+
+from . import network
+from .game import DEFAULT_MOVE_BUDGET, run_game
+from .results import GameResult
+
+# Directory holding one progress file per campaign.
+CAMPAIGN_DIR = Path("campaigns")
+
+# Sessions played at the same time.
+DEFAULT_WORKERS = 4
+# Sessions open on one server at the same time, across all campaigns of
+# this process.  One campaign never has more than its workers open, so a
+# limit above them only matters when several campaigns run at once.
+SERVER_LIMIT = DEFAULT_WORKERS
+# Seconds a session may wait for its first turn, and may take in total,
+# before it is abandoned as failed.
+START_TIMEOUT = 120.0
+SESSION_TIMEOUT = 1800.0
+# Further attempts after a session failed, and the delay before the first
+# of them; later attempts wait proportionally longer.
+DEFAULT_RETRIES = 2
+RETRY_DELAY = 5.0
+
+# Semaphores limiting the sessions per server URL.
+_SERVER_SLOTS: Dict[str, threading.BoundedSemaphore] = {}
+_SLOTS_LOCK = threading.Lock()
+
+
+def server_slots(url: str, limit: int = SERVER_LIMIT) -> threading.BoundedSemaphore:
+    """Return the semaphore of ``url``, created with ``limit`` slots on first use."""
+    with _SLOTS_LOCK:
+        slots = _SERVER_SLOTS.get(url)
+        if slots is None:
+            slots = _SERVER_SLOTS[url] = threading.BoundedSemaphore(limit)
+        return slots
+
+
+class Task(NamedTuple):
+    model: str
+    map: str
+    # Number of the game among the model's games on the map.
+    game: int
+
+
+def plan(models: List[str], maps: List[str], games: int) -> List[Task]:
+    """Return the sessions of a campaign, map by map."""
+    return [
+        Task(model, map_name, game)
+        for map_name in maps
+        for game in range(games)
+        for model in models
+    ]
+
+
+class Progress:
+    """Append-only record of the finished sessions of one campaign."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.done: Set[Task] = set()
+        self._lock = threading.Lock()
+        if path.exists():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.done.add(Task(entry["model"], entry["map"], entry["game"]))
+                    except (ValueError, KeyError):
+                        # A line cut short by an interrupted write.
+                        continue
+
+    def add(self, task: Task, result: GameResult) -> None:
+        entry = dict(task._asdict(), session=result.session, team=result.team)
+        entry.update(score=result.score, opponent_score=result.opponent_score)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.done.add(task)
+
+
+def run_campaign(
+    player_id: str,
+    models: List[str],
+    maps: List[str] | None = None,
+    games: int = 1,
+    name: str = "default",
+    workers: int = DEFAULT_WORKERS,
+    server_limit: int = SERVER_LIMIT,
+    retries: int = DEFAULT_RETRIES,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+    worker: bool = True,
+    speculate: bool = False,
+    start_timeout: float = START_TIMEOUT,
+    session_timeout: float = SESSION_TIMEOUT,
+) -> Dict[str, int]:
+    """Play ``games`` sessions of every model on every map.
+
+    ``maps`` defaults to all maps offered by the server.  Sessions recorded
+    in the progress file of campaign ``name`` are skipped.  Returns how
+    many sessions were played, skipped and failed.
+    """
+    if maps is None:
+        maps = network.get_maps(player_id)
+    progress = Progress(CAMPAIGN_DIR / f"{name}.jsonl")
+    tasks = plan(models, maps, games)
+    todo = [task for task in tasks if task not in progress.done]
+    print(
+        f"Campaign {name}: {len(tasks)} sessions on {len(maps)} maps, "
+        f"{len(tasks) - len(todo)} already played"
+    )
+    slots = server_slots(network.BASE_URL, server_limit)
+
+    def play(task: Task) -> GameResult | None:
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(RETRY_DELAY * attempt)
+            with slots:
+                try:
+                    return run_game(
+                        player_id,
+                        task.model,
+                        task.map,
+                        "none",
+                        move_budget,
+                        worker,
+                        speculate,
+                        start_timeout,
+                        session_timeout,
+                    )
+                except Exception as exc:  # any failure of a session is retried
+                    print(
+                        f"[campaign] {task.model} on {task.map} failed "
+                        f"(attempt {attempt + 1}/{retries + 1}): {exc!r}"
+                    )
+        return None
+
+    played = failed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="campaign") as pool:
+        futures = {pool.submit(play, task): task for task in todo}
+        for future in as_completed(futures):
+            task = futures[future]
+            result = future.result()
+            if result is None:
+                failed += 1
+                continue
+            progress.add(task, result)
+            played += 1
+            print(
+                f"[campaign] {len(progress.done)}/{len(tasks)} {task.model} on {task.map} "
+                f"(game {task.game + 1}): {result.score} - {result.opponent_score}"
+            )
+    print(
+        f"Campaign {name}: {played} played, {len(tasks) - len(todo)} skipped, "
+        f"{failed} failed"
+    )
+    return {"played": played, "skipped": len(tasks) - len(todo), "failed": failed}
@@ -0,0 +1,220 @@
+"""Multi-source BFS distance fields over a compiled map.
+
+When NumPy is installed the fields are computed frontier by frontier with
+array operations on the neighbour table; otherwise a plain Python BFS is
+used.  Both backends return one integer per cell with :data:`UNREACHABLE`
+marking walls and cells that cannot be reached.
+
+:class:`FieldTable` answers the queries of an all-pairs
+:class:`~kyberna_ctf.distances.DistanceTable` from cached fields, for maps
+too large to build such a table within a turn.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict, deque
+from typing import Iterable, List, Optional, Sequence
+
+from .distances import UNREACHABLE
+from .hexmap import CompiledMap
+
+try:  # NumPy is optional
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Fields kept by a FieldTable before the least recently used one is dropped.
+FIELD_CACHE_SIZE = 128
+
+
+def _padded_neighbors(cmap: CompiledMap):
+    """Return the neighbour table as an ``(size + 1, 6)`` NumPy array.
+
+    Missing neighbours point to the extra sentinel row ``size`` so that the
+    table can be indexed without masking.
+    """
+    table = cmap.derived.get("np_neighbors")
+    if table is None:
+        size = cmap.size
+        table = np.full((size + 1, 6), size, dtype=np.int32)
+        raw = np.frombuffer(cmap.neighbors, dtype=np.int32).reshape(size, 6)
+        table[:size] = np.where(raw < 0, size, raw)
+        cmap.derived["np_neighbors"] = table
+    return table
+
+
+def _field_numpy(cmap: CompiledMap, sources: List[int]):
+    size = cmap.size
+    neighbors = _padded_neighbors(cmap)
+    dist = np.full(size + 1, UNREACHABLE, dtype=np.int32)
+    # The sentinel counts as visited so it never enters a frontier.
+    dist[size] = 0
+    frontier = np.unique(np.asarray(sources, dtype=np.int32))
+    dist[frontier] = 0
+    d = 0
+    while frontier.size:
+        d += 1
+        candidates = neighbors[frontier].ravel()
+        candidates = candidates[dist[candidates] == UNREACHABLE]
+        if not candidates.size:
+            break
+        frontier = np.unique(candidates)
+        dist[frontier] = d
+    return dist[:size]
+
+
+def _field_python(cmap: CompiledMap, sources: List[int]) -> array:
+    dist = array("i", [UNREACHABLE]) * cmap.size
+    adjacency = cmap.adjacency
+    queue = deque()
+    for s in sources:
+        if dist[s] == UNREACHABLE:
+            dist[s] = 0
+            queue.append(s)
+    while queue:
+        current = queue.popleft()
+        d = dist[current] + 1
+        for _, nxt in adjacency[current]:
+            if dist[nxt] == UNREACHABLE:
+                dist[nxt] = d
+                queue.append(nxt)
+    return dist
+
+
+def distance_field(cmap: CompiledMap, sources: Iterable[int]) -> Sequence[int]:
+    """Return the BFS distance from the nearest of ``sources`` to every cell."""
+    sources = list(sources)
+    if not sources:
+        if HAS_NUMPY:
+            return np.full(cmap.size, UNREACHABLE, dtype=np.int32)
+        return array("i", [UNREACHABLE]) * cmap.size
+    if HAS_NUMPY:
+        return _field_numpy(cmap, sources)
+    return _field_python(cmap, sources)
+
+
+def static_field(cmap: CompiledMap, source: int) -> Sequence[int]:
+    """Return :func:`distance_field` from ``source``, cached on ``cmap``.
+
+    Meant for fixed map features such as bases whose field never changes.
+    """
+    key = ("field", source)
+    field = cmap.derived.get(key)
+    if field is None:
+        field = cmap.derived[key] = distance_field(cmap, [source])
+    return field
+
+
+class FieldTable:
+    """Distances between cells read off one BFS field per target.
+
+    Offers the queries of :class:`~kyberna_ctf.distances.DistanceTable`
+    without building the whole table up front.  Paths are symmetric, so
+    ``distance(a, b)`` looks up ``a`` in the field of ``b``.  Fields are
+    computed on first use and the latest :data:`FIELD_CACHE_SIZE` are kept.
+    """
+
+    __slots__ = ("width", "height", "_cmap", "_fields")
+
+    def __init__(self, cmap: CompiledMap) -> None:
+        self.width = cmap.width
+        self.height = cmap.height
+        self._cmap = cmap
+        self._fields: "OrderedDict[int, List[int]]" = OrderedDict()
+
+    def field(self, source: int) -> List[int]:
+        """Return distances from ``source`` to every cell of the map."""
+        fields = self._fields
+        field = fields.get(source)
+        if field is not None:
+            fields.move_to_end(source)
+            return field
+        if not self._cmap.passable[source]:
+            return [UNREACHABLE] * self._cmap.size
+        # Plain ints; indexing NumPy arrays per query is far slower.
+        field = fields[source] = distance_field(self._cmap, [source]).tolist()
+        if len(fields) > FIELD_CACHE_SIZE:
+            fields.popitem(last=False)
+        return field
+
+    def distance(self, a: int, b: int) -> Optional[int]:
+        """Return the path length between cell indices ``a`` and ``b``."""
+        d = self.field(b)[a]
+        return None if d == UNREACHABLE else d
+
+
+def proximity_costs(
+    danger: Sequence[int],
+    attraction: Sequence[int],
+    alpha: float,
+    beta: float,
+    danger_radius: int | None = None,
+) -> List[float]:
+    """Return per-cell step costs ``1 + alpha/(danger+1) - beta/(attraction+1)``.
+
+    Unreachable entries of either field contribute nothing, and neither do
+    danger distances beyond ``danger_radius`` when it is given.
+    """
+    limit = UNREACHABLE if danger_radius is None else danger_radius + 1
+    if HAS_NUMPY:
+        d = np.asarray(danger, dtype=np.float64)
+        a = np.asarray(attraction, dtype=np.float64)
+        cost = np.ones(d.shape, dtype=np.float64)
+        cost += np.where(d < limit, alpha / (d + 1.0), 0.0)
+        cost -= np.where(a != UNREACHABLE, beta / (a + 1.0), 0.0)
+        return cost.tolist()
+    return [
+        1.0
+        + (alpha / (dv + 1) if dv < limit else 0.0)
+        - (beta / (av + 1) if av != UNREACHABLE else 0.0)
+        for dv, av in zip(danger, attraction)
+    ]
+
+
+def earliest_intercept(
+    own: Sequence[int],
+    enemy: Sequence[int],
+    goals: Sequence[int],
+    goal_fields: Sequence[Sequence[int]],
+) -> int | None:
+    """Return the earliest cell where we can meet the enemy on its way to a goal.
+
+    ``own`` and ``enemy`` are distance fields from our player and from the
+    enemy, ``goal_fields[i]`` the field from ``goals[i]``.  A cell lies on a
+    shortest enemy path to goal ``i`` when ``enemy + goal_fields[i]`` equals
+    the enemy's distance to that goal; among those we reach no later than the
+    enemy, the one the enemy reaches first wins (ties go to the cell closer to
+    us).  Returns ``None`` if there is no such cell.
+    """
+    if not goals:
+        return None
+    if HAS_NUMPY:
+        e = np.asarray(enemy, dtype=np.int32)
+        o = np.asarray(own, dtype=np.int32)
+        lengths = e[np.asarray(goals, dtype=np.intp)]
+        rows = np.asarray(goal_fields, dtype=np.int32)
+        on_path = (e + rows == lengths[:, None]) & (lengths[:, None] != UNREACHABLE)
+        mask = on_path.any(axis=0) & (e != UNREACHABLE) & (o <= e)
+        cells = np.flatnonzero(mask)
+        if not cells.size:
+            return None
+        order = np.lexsort((o[cells], e[cells]))
+        return int(cells[order[0]])
+
+    lengths = [enemy[g] for g in goals]
+    best = None
+    best_key = None
+    for cell, (ev, ov) in enumerate(zip(enemy, own)):
+        if ev == UNREACHABLE or ov > ev:
+            continue
+        key = (ev, ov)
+        if best_key is not None and key >= best_key:
+            continue
+        for length, field in zip(lengths, goal_fields):
+            if length != UNREACHABLE and ev + field[cell] == length:
+                best, best_key = cell, key
+                break
+    return best
@@ -1,38 +1,244 @@
+import contextvars
 import time
-from datetime import datetime
-from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
 from threading import Thread
-from playwright.sync_api import sync_playwright
 
 from . import network
 import requests
 from .ai import AIBase
+from .metrics import Metrics, recording, write_metrics
 from .models import ALL_MODELS
+from .polling import AdaptivePoller
+from .replay import ReplayWriter
+from .results import GameResult, record_result, session_result
+from .state import GameState
+from .speculation import SpeculativeAI
+from .worker import RemoteAI
 
-# Polling interval while waiting for the opponent or game to start.
-POLL_INTERVAL = 0.1
+# How the game board is displayed: not at all, in a headless browser or in a
+# visible Chrome window.
+VIEW_MODES = ("none", "headless", "headed")
 
-# File used to persist game results
-SCORE_LOG_FILE = Path("scores.log")
+# Wall-clock seconds an AI may spend on one move before the fallback move is
+# sent instead.
+DEFAULT_MOVE_BUDGET = 1.0
+# Portion of the budget passed to ``choose_move`` as its soft deadline; the
+# rest is headroom for the model to notice and return.
+SOFT_DEADLINE_FRACTION = 0.8
 
 
-def _log_score(map_name: str, team_color: str, score) -> None:
-    """Append the map and scores to the score log file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    SCORE_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with SCORE_LOG_FILE.open("a", encoding="utf-8") as f:
-        if isinstance(score, dict) and "Red" in score and "Blue" in score:
-            red = score.get("Red", 0)
-            blue = score.get("Blue", 0)
-            f.write(
-                f"{timestamp} | Map: {map_name} | Team: {team_color} | "
-                f"Red: {red}, Blue: {blue}\n"
-            )
-        else:
-            f.write(
-                f"{timestamp} | Map: {map_name} | Team: {team_color} | "
-                f"Score: {score}\n"
+class _BoardView:
+    """Optional browser page displaying the game board.
+
+    Playwright is imported only when a browser is actually requested so bot
+    sessions without a view neither pay its import time nor launch Chrome.
+    """
+
+    def __init__(self, mode: str, url: str) -> None:
+        if mode not in VIEW_MODES:
+            raise ValueError(f"Unknown view mode: {mode}")
+        self.mode = mode
+        self.url = url
+        self._playwright = None
+        self._browser = None
+        self._page = None
+
+    def __enter__(self) -> "_BoardView":
+        if self.mode == "none":
+            return self
+        from playwright.sync_api import sync_playwright
+
+        print("Launching browser to display game board...")
+        self._playwright = sync_playwright().start()
+        try:
+            self._browser = self._playwright.chromium.launch(
+                headless=self.mode == "headless", channel="chrome"
             )
+            self._page = self._browser.new_page()
+            self._page.goto(self.url)
+        except BaseException:
+            # ``__exit__`` does not run when ``__enter__`` fails.
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def refresh(self) -> None:
+        if self._page is not None:
+            self._page.reload()
+
+    def __exit__(self, *exc) -> None:
+        if self._browser is not None:
+            self._browser.close()
+        if self._playwright is not None:
+            self._playwright.stop()
+
+
+class _TurnFetcher:
+    """Fetch the inputs of an AI turn with as few round trips as possible.
+
+    The map never changes within a session, so it is requested only once and
+    cached.  Entities and score are requested in parallel, making a turn cost
+    a single round trip.  The requests run in the caller's context so their
+    round trips count towards the current session's metrics.
+    """
+
+    def __init__(self, player_id: str, session_id: str) -> None:
+        self.player_id = player_id
+        self.session_id = session_id
+        self.game_map: dict | None = None
+        self._pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="fetch")
+
+    def __enter__(self) -> "_TurnFetcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pool.shutdown(wait=False)
+
+    def _submit(self, fn, *args) -> Future:
+        return self._pool.submit(contextvars.copy_context().run, fn, *args)
+
+    def fetch(self) -> tuple[dict, list, dict]:
+        ids = (self.player_id, self.session_id)
+        map_future = None
+        if self.game_map is None:
+            map_future = self._submit(network.get_map, *ids)
+        entities_future = self._submit(network.get_entities, *ids)
+        score_future = self._submit(network.get_score, *ids)
+        if map_future is not None:
+            self.game_map = map_future.result()
+        return self.game_map, entities_future.result(), score_future.result()
+
+
+class _MoveGuard:
+    """Run ``choose_move`` in a worker thread against a hard deadline.
+
+    The model gets a soft deadline to return its best move so far.  If it
+    still overruns the budget, :meth:`AIBase.fallback_move` is used.  A call
+    that overran keeps running in the background; until it finishes every
+    move is a fallback move so the model is never entered twice at once.
+
+    Speculative models prepare their replies on the same thread while the
+    opponent is thinking.  The preparation is stopped as soon as the opponent
+    has answered, so the next decision only waits for the reply in progress
+    to notice.
+    """
+
+    def __init__(self, ai: AIBase, budget: float = DEFAULT_MOVE_BUDGET) -> None:
+        self.ai = ai
+        self.budget = budget
+        self.fallbacks = 0
+        self.speculative = getattr(ai, "speculative", False)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="think")
+        self._pending: Future | None = None
+        self._speculation: Future | None = None
+
+    def __enter__(self) -> "_MoveGuard":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pool.shutdown(wait=False)
+
+    def submit(self, game_map, state, score) -> Future | None:
+        """Start :meth:`AIBase.decide` or return ``None`` if the model is busy."""
+        pending = self._pending
+        if pending is not None and pending is not self._speculation and not pending.done():
+            return None
+        self.stop_speculation()
+        deadline = time.perf_counter() + self.budget * SOFT_DEADLINE_FRACTION
+        self._pending = self._pool.submit(
+            self.ai.decide, game_map, state, score, deadline
+        )
+        return self._pending
+
+    def speculate(self, game_map, state, score, move: int, budget: float | None) -> None:
+        """Precompute replies to the opponent's answers to our ``move``.
+
+        ``budget`` is the time the opponent is expected to take, see
+        :meth:`~kyberna_ctf.polling.AdaptivePoller.expected_latency`.  Until
+        it is known nothing is prepared.
+        """
+        if not self.speculative or budget is None:
+            return
+        if self._pending is not None and not self._pending.done():
+            return
+        self.ai.cancel.clear()
+        deadline = time.perf_counter() + budget
+        self._pending = self._speculation = self._pool.submit(
+            self.ai.prepare, game_map, state, score, move, deadline
+        )
+
+    def stop_speculation(self) -> None:
+        """Stop preparing replies; the ones finished so far are kept."""
+        if self.speculative:
+            self.ai.cancel.set()
+
+    def describe(self) -> str:
+        text = f"{self.fallbacks} fallback moves after missed deadlines"
+        # Queued behind any late decision so the model is not entered twice.
+        try:
+            details = self._pool.submit(self.ai.describe).result(self.budget)
+        except TimeoutError:
+            details = ""
+        if details:
+            text += f", {details}"
+        return text
+
+    def collect_metrics(self) -> Metrics:
+        """Return the model's metrics, or empty ones if it does not answer."""
+        try:
+            return self._pool.submit(self.ai.collect_metrics).result(self.budget)
+        except TimeoutError:
+            return Metrics()
+
+    def fallback(self, game_map, state) -> int:
+        self.fallbacks += 1
+        return self.ai.fallback_move(game_map, state)
+
+    def choose(self, game_map, state, score) -> int:
+        """Return the model's move, or the fallback move if it runs late."""
+        start = time.perf_counter()
+        future = self.submit(game_map, state, score)
+        if future is not None:
+            try:
+                return int(future.result(self.budget - (time.perf_counter() - start)))
+            except TimeoutError:
+                pass
+        return self.fallback(game_map, state)
+
+
+def _make_ai(
+    ai_cls: type[AIBase], team_color: str, worker: bool, speculate: bool
+) -> AIBase:
+    """Instantiate ``ai_cls`` for a session, in a worker process if asked."""
+    if worker:
+        return RemoteAI(ai_cls, team_color, speculate)
+    ai = ai_cls(team_color=team_color)
+    return SpeculativeAI(ai) if speculate else ai
+
+
+def _record_result(
+    model: str,
+    map_name: str,
+    team_color: str,
+    session_id: str,
+    score,
+    session_metrics: Metrics,
+    started: float,
+) -> GameResult:
+    """Queue the outcome of a finished session on the results store and return it."""
+    decisions = session_metrics.histograms.get("decision_time")
+    result = session_result(
+        model,
+        map_name,
+        team_color,
+        session_id,
+        score,
+        decisions.count if decisions is not None else 0,
+        decisions.total if decisions is not None else 0.0,
+        time.perf_counter() - started,
+    )
+    record_result(result)
+    return result
 
 
 def _select_map(player_id: str) -> str:
@@ -67,22 +273,49 @@ def _play_session(
     team_color: str,
     map_name: str,
     ai: AIBase | None = None,
-) -> None:
-    session_url = f"https://ctf.kyberna.cz/Session/{session_id}"
-    print("Launching browser to display game board...")
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=False, channel="chrome")
-        page = browser.new_page()
-        page.goto(session_url)
+    view: str | None = None,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+    start_timeout: float | None = None,
+    session_timeout: float | None = None,
+) -> GameResult:
+    """Play a created session until the game is over and return its result.
+
+    Raises :class:`TimeoutError` if our first turn has not come within
+    ``start_timeout`` seconds or the game is not over within
+    ``session_timeout`` seconds.
+    """
+    if view is None:
+        view = "headed" if ai is None else "none"
+    session_url = f"{network.BASE_URL}/Session/{session_id}"
+    model = ai.name if ai is not None else "Manual"
+    started = time.perf_counter()
+    with _BoardView(view, session_url) as board, _TurnFetcher(
+        player_id, session_id
+    ) as fetcher, _MoveGuard(ai, move_budget) as guard, ReplayWriter(
+        map_name, team_color, model, session_id
+    ) as replay, recording(Metrics()) as session_metrics:
         print("Waiting for the game to start...")
+        poller = AdaptivePoller(metrics=session_metrics)
         last_state = None
+        begun = False
         while True:
             player_state = network.get_state(player_id, session_id)
+            elapsed = time.perf_counter() - started
+            begun = begun or player_state == "Ready"
+            if player_state != "GameOver":
+                if session_timeout is not None and elapsed > session_timeout:
+                    raise TimeoutError(
+                        f"Session {session_id} not over after {session_timeout:g}s"
+                    )
+                if not begun and start_timeout is not None and elapsed > start_timeout:
+                    raise TimeoutError(
+                        f"Session {session_id} did not start within {start_timeout:g}s"
+                    )
 
             if player_state != last_state:
                 if player_state != "Waiting":
                     print(f"State changed to: {player_state}")
-                page.reload()
+                board.refresh()
                 last_state = player_state
 
             if player_state == "GameOver":
@@ -99,38 +332,95 @@ def _play_session(
                 else:
                     print(f"Final score: {score}")
 
-                _log_score(map_name, team_color, score)
-                break
+                print(f"Polling: {poller.describe()}")
+                if ai is not None:
+                    print(f"Moves: {guard.describe()}")
+                if replay.turns:
+                    print(f"Replay saved to {replay.path}")
+                if ai is not None:
+                    session_metrics.merge(guard.collect_metrics())
+                print("Metrics:")
+                for line in session_metrics.summary():
+                    print(f"  {line}")
+                write_metrics(
+                    session_metrics,
+                    session=session_id,
+                    map=map_name,
+                    team=team_color,
+                    model=model,
+                    score=score,
+                )
+                return _record_result(
+                    model, map_name, team_color, session_id, score, session_metrics, started
+                )
 
             if player_state == "Ready":
+                poller.ready()
+                guard.stop_speculation()
                 if ai is None:
                     direction = None
                     while direction not in {"1", "2", "3", "4", "5", "6"}:
                         direction = input("Your turn! Enter move direction (1-6): ").strip()
                 else:
-                    game_map = network.get_map(player_id, session_id)
-                    entities = network.get_entities(player_id, session_id)
-                    score = network.get_score(player_id, session_id)
+                    game_map, entities, score = fetcher.fetch()
                     start = time.perf_counter()
-                    direction = str(ai.choose_move(game_map, entities, score))
+                    state = GameState.from_entities(
+                        entities, team_color, game_map["width"], score
+                    )
+                    fallbacks = guard.fallbacks
+                    direction = str(guard.choose(game_map, state, score))
                     duration = time.perf_counter() - start
+                    fallback = guard.fallbacks > fallbacks
                     print(f"AI chose direction {direction} in {duration:.2f}s")
+                    session_metrics.observe("decision_time", duration)
+                    session_metrics.count("fallbacks", int(fallback))
+                    replay.record(
+                        game_map, entities, score, int(direction), duration, fallback
+                    )
                 try:
                     network.send_move(player_id, session_id, int(direction))
                 except requests.RequestException as exc:
                     print(f"Failed to send move: {exc}")
                 else:
+                    poller.move_sent()
+                    if ai is not None:
+                        guard.speculate(
+                            game_map, state, score, int(direction), poller.expected_latency()
+                        )
                     print("Move sent. Waiting for opponent...")
+                    poller.wait()
             else:
-                # Sleep only briefly while waiting for the opponent so the UI
-                # remains responsive.
-                time.sleep(POLL_INTERVAL)
+                # Poll close to the expected opponent answer and back off
+                # while the wait drags on.
+                poller.wait()
+
 
-        browser.close()
+def run_game(
+    player_id: str,
+    ai_name: str | None = None,
+    map_name: str | None = None,
+    view: str | None = None,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+    worker: bool = True,
+    speculate: bool = False,
+    start_timeout: float | None = None,
+    session_timeout: float | None = None,
+) -> GameResult:
+    """Run a game session, either manually or with a specific AI.
 
+    ``view`` is one of :data:`VIEW_MODES`; by default manual games open a
+    visible browser and AI games run without one.  ``move_budget`` is the
+    time in seconds the AI may spend on one move.  With ``worker`` the AI
+    runs in its own process (see :class:`~kyberna_ctf.worker.RemoteAI`) and
+    with ``speculate`` it prepares its replies during the opponent's turn
+    (see :class:`~kyberna_ctf.speculation.SpeculativeAI`).  Returns the
+    result as stored in the results database.
 
-def run_game(player_id: str, ai_name: str | None = None, map_name: str | None = None) -> None:
-    """Run a game session, either manually or with a specific AI."""
+    ``start_timeout`` and ``session_timeout`` bound the wait for our first
+    turn and for the end of the game in seconds; a session exceeding them
+    raises :class:`TimeoutError`.  By default the session waits as long as
+    it takes.
+    """
 
     if ai_name is None:
         mode = ""
@@ -151,23 +441,48 @@ def run_game(player_id: str, ai_name: str | None = None, map_name: str | None =
             except KeyError as exc:
                 raise ValueError(f"Unknown AI model: {ai_name}") from exc
         session_id, team_color = network.create_session(player_id, map_name, session_type="Ai")
-        ai = ai_cls(team_color=team_color)
+        ai = _make_ai(ai_cls, team_color, worker, speculate)
     else:
         ai = None
         session_id, team_color = network.create_session(player_id, map_name, session_type="Manual")
 
     print(f"Session ID: {session_id}, Team Color: {team_color}")
-    _play_session(player_id, session_id, team_color, map_name, ai)
+    try:
+        return _play_session(
+            player_id,
+            session_id,
+            team_color,
+            map_name,
+            ai,
+            view,
+            move_budget,
+            start_timeout,
+            session_timeout,
+        )
+    finally:
+        if ai is not None:
+            ai.close()
 
 
-def run_games(player_id: str, ai_names: list[str], map_name: str | None = None) -> None:
+def run_games(
+    player_id: str,
+    ai_names: list[str],
+    map_name: str | None = None,
+    view: str | None = None,
+    move_budget: float = DEFAULT_MOVE_BUDGET,
+    worker: bool = True,
+    speculate: bool = False,
+) -> None:
     """Run multiple AI sessions concurrently."""
     if map_name is None:
         map_name = _select_map(player_id)
 
     threads: list[Thread] = []
     for name in ai_names:
-        t = Thread(target=run_game, args=(player_id, name, map_name))
+        t = Thread(
+            target=run_game,
+            args=(player_id, name, map_name, view, move_budget, worker, speculate),
+        )
         t.start()
         threads.append(t)
 
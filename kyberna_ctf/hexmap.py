@@ -0,0 +1,140 @@
+"""Compiled hexagonal map representation shared by the AI models.
+
+The server describes a map as ``{"width", "height", "cells"}`` where ``cells``
+is a flat list of ``{"type": "Empty" | "Wall"}`` dicts in row-major order.
+Walking that structure for every neighbour expansion is slow, so the models
+work on a :class:`CompiledMap` instead: a flat passability ``bytearray`` plus a
+precomputed table of the six neighbour indices of every cell.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+# Direction mapping for a hexagonal grid using axial coordinates
+# 1: up, 2: top-right, 3: bottom-right, 4: down, 5: bottom-left, 6: top-left
+DIRS = {
+    1: (0, -1),
+    2: (1, -1),
+    3: (1, 0),
+    4: (0, 1),
+    5: (-1, 1),
+    6: (-1, 0),
+}
+
+# Marker used in the neighbour table for walls and cells outside the map.
+NO_CELL = -1
+
+
+def offset_to_axial(x: int, y: int) -> Tuple[int, int]:
+    """Convert odd-q offset coordinates to axial coordinates."""
+    q = x
+    r = y - (x - (x & 1)) // 2
+    return q, r
+
+
+def axial_to_offset(q: int, r: int) -> Tuple[int, int]:
+    """Convert axial coordinates back to odd-q offset."""
+    x = q
+    y = r + (q - (q & 1)) // 2
+    return x, y
+
+
+class CompiledMap:
+    """Flat passability grid with a precomputed neighbour table.
+
+    Cells are addressed by their row-major index ``y * width + x``.
+    ``neighbors[i * 6 + d - 1]`` holds the index of the passable cell reached
+    from ``i`` in direction ``d`` or :data:`NO_CELL`.  ``adjacency[i]`` holds
+    the same information as a tuple of ``(direction, index)`` pairs which is
+    the fastest form to iterate from pure Python.  ``derived`` caches other
+    representations computed from the layout by helper modules.
+    """
+
+    __slots__ = (
+        "width",
+        "height",
+        "size",
+        "passable",
+        "neighbors",
+        "adjacency",
+        "axial_q",
+        "axial_r",
+        "derived",
+    )
+
+    def __init__(self, width: int, height: int, passable: bytes | bytearray) -> None:
+        if len(passable) != width * height:
+            raise ValueError("Passability grid does not match map dimensions.")
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.passable = bytearray(passable)
+        self.neighbors = array("i", [NO_CELL]) * (self.size * 6)
+        self.axial_q = array("i", [0]) * self.size
+        self.axial_r = array("i", [0]) * self.size
+        # Lazily computed data derived from the layout (e.g. NumPy views).
+        self.derived: Dict[str, object] = {}
+
+        adjacency: List[Tuple[Tuple[int, int], ...]] = []
+        for y in range(height):
+            for x in range(width):
+                i = y * width + x
+                q, r = offset_to_axial(x, y)
+                self.axial_q[i] = q
+                self.axial_r[i] = r
+                moves = []
+                for direction, (dq, dr) in DIRS.items():
+                    nx, ny = axial_to_offset(q + dq, r + dr)
+                    if 0 <= nx < width and 0 <= ny < height:
+                        j = ny * width + nx
+                        if self.passable[j]:
+                            self.neighbors[i * 6 + direction - 1] = j
+                            moves.append((direction, j))
+                adjacency.append(tuple(moves))
+        self.adjacency = adjacency
+
+    @classmethod
+    def from_game_map(cls, game_map: Dict) -> "CompiledMap":
+        """Build the compiled representation of a ``GameMap`` payload."""
+        passable = bytearray(
+            cell["type"] != "Wall" for cell in game_map["cells"]
+        )
+        return cls(game_map["width"], game_map["height"], passable)
+
+    # ------------------------------------------------------------------
+    # Coordinate helpers
+    # ------------------------------------------------------------------
+    def index(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def coords(self, index: int) -> Tuple[int, int]:
+        return index % self.width, index // self.width
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_wall(self, x: int, y: int) -> bool:
+        return not self.passable[y * self.width + x]
+
+    def neighbor(self, index: int, direction: int) -> int:
+        """Return the passable cell reached by ``direction`` or ``NO_CELL``."""
+        return self.neighbors[index * 6 + direction - 1]
+
+    def neighbors_of(self, index: int) -> Iterator[Tuple[int, int]]:
+        """Yield ``(direction, index)`` for every passable neighbour."""
+        return iter(self.adjacency[index])
+
+    def hex_distance(self, a: int, b: int) -> int:
+        """Return the wall-ignoring hex distance between two cells."""
+        dq = self.axial_q[a] - self.axial_q[b]
+        dr = self.axial_r[a] - self.axial_r[b]
+        return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+
+def compile_map(game_map: Dict | CompiledMap) -> CompiledMap:
+    """Return ``game_map`` as a :class:`CompiledMap`, compiling it if needed."""
+    if isinstance(game_map, CompiledMap):
+        return game_map
+    return CompiledMap.from_game_map(game_map)
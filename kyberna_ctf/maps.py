@@ -0,0 +1,226 @@
+"""Map definitions for offline play.
+
+A :class:`LocalMap` bundles a ``GameMap`` payload with the entities present
+at the start of a game, i.e. exactly what the real server returns from
+``/Game/Map`` and ``/Game/Entities`` on the first turn.  Maps can be saved to
+and loaded from JSON files or generated synthetically.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .hexmap import CompiledMap
+
+TEAMS = ("Red", "Blue")
+
+# Layouts understood by :func:`generate_map`.
+STYLES = ("random", "corridors", "maze")
+# Corridor layouts have a wall row every ``CORRIDOR_SPACING`` rows in which
+# each cell is a door with probability ``DOOR_RATE``.
+CORRIDOR_SPACING = 4
+DOOR_RATE = 0.15
+
+
+class LocalMap:
+    """A map layout together with its starting entities."""
+
+    __slots__ = ("name", "game_map", "entities")
+
+    def __init__(self, name: str, game_map: Dict, entities: List[Dict]) -> None:
+        self.name = name
+        self.game_map = game_map
+        self.entities = entities
+
+    def to_json(self) -> Dict:
+        return {"name": self.name, "map": self.game_map, "entities": self.entities}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "LocalMap":
+        return cls(data["name"], data["map"], data["entities"])
+
+
+def save_map(local_map: LocalMap, path: Path) -> None:
+    """Write ``local_map`` to ``path`` as JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(local_map.to_json(), f)
+
+
+def load_map(path: Path) -> LocalMap:
+    """Read a map written by :func:`save_map`."""
+    with path.open("r", encoding="utf-8") as f:
+        return LocalMap.from_json(json.load(f))
+
+
+def load_maps(directory: Path) -> Dict[str, LocalMap]:
+    """Load every ``*.json`` map in ``directory`` keyed by map name."""
+    maps = {}
+    for path in sorted(directory.glob("*.json")):
+        local_map = load_map(path)
+        maps[local_map.name] = local_map
+    return maps
+
+
+def _entity(kind: str, team: str, x: int, y: int) -> Dict:
+    return {
+        "gameEntityId": f"{team}-{kind}",
+        "teamColor": team,
+        "type": kind,
+        "location": {"x": x, "y": y},
+    }
+
+
+def _connected(cmap: CompiledMap, cells: List[int]) -> bool:
+    seen = {cells[0]}
+    queue = deque([cells[0]])
+    while queue:
+        current = queue.popleft()
+        for _, nxt in cmap.adjacency[current]:
+            if nxt not in seen:
+                seen.add(nxt)
+                queue.append(nxt)
+    return all(c in seen for c in cells)
+
+
+def _maze(width: int, height: int, starts: List[int], rnd: random.Random) -> bytearray:
+    """Carve point-symmetric single-width passages grown from ``starts``.
+
+    A cell is only carved while it touches exactly one carved cell, so the
+    passages never widen.  Every cell is carved together with its mirror
+    image.  Growing this way leaves separate trees (at least the two
+    halves), which are then joined by opening single walls between them.
+    """
+    size = width * height
+    adjacency = CompiledMap(width, height, b"\x01" * size).adjacency
+    carved = bytearray(size)
+
+    def carve(cell: int) -> None:
+        # ``size - 1 - cell`` is the cell rotated by 180 degrees.
+        carved[cell] = carved[size - 1 - cell] = 1
+
+    for cell in starts:
+        carve(cell)
+    stack = list(starts)
+    while stack:
+        options = [
+            nxt
+            for _, nxt in adjacency[stack[-1]]
+            if not carved[nxt] and sum(carved[n] for _, n in adjacency[nxt]) == 1
+        ]
+        if not options:
+            stack.pop()
+            continue
+        nxt = rnd.choice(options)
+        carve(nxt)
+        stack.append(nxt)
+
+    while True:
+        seen = {starts[0]}
+        queue = deque(seen)
+        while queue:
+            for _, nxt in adjacency[queue.popleft()]:
+                if carved[nxt] and nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        doors = [
+            cell
+            for cell in range(size)
+            if not carved[cell]
+            and any(n in seen for _, n in adjacency[cell])
+            and any(carved[n] and n not in seen for _, n in adjacency[cell])
+        ]
+        if not doors:
+            return carved
+        carve(rnd.choice(doors))
+
+
+def generate_map(
+    name: str,
+    width: int,
+    height: int,
+    wall_density: float = 0.2,
+    seed: int | None = None,
+    style: str = "random",
+) -> LocalMap:
+    """Generate a random point-symmetric map with both teams' entities.
+
+    ``width`` is rounded up to an even number, which makes the 180 degree
+    rotation an exact symmetry of the odd-q hex grid so both teams get
+    equivalent positions.
+
+    ``style`` is one of :data:`STYLES`.  ``"random"`` makes every cell a
+    wall with probability ``wall_density``.  ``"corridors"`` adds wall rows
+    broken by doors and scatters walls between them.  ``"maze"`` carves
+    narrow passages and ignores ``wall_density``.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown map style: {style}")
+    if width % 2:
+        width += 1
+    if width < 6 or height < 6:
+        raise ValueError("Maps must be at least 6x6.")
+    rnd = random.Random(seed)
+
+    red_spots: Dict[str, Tuple[int, int]] = {
+        "Base": (1, 1),
+        "Player": (2, 2),
+        "Flag": (1, 3),
+    }
+
+    def mirror(x: int, y: int) -> Tuple[int, int]:
+        return width - 1 - x, height - 1 - y
+
+    spots = {("Red", k): v for k, v in red_spots.items()}
+    spots.update({("Blue", k): mirror(*v) for k, v in red_spots.items()})
+    reserved = {y * width + x for x, y in spots.values()}
+
+    red_cells = sorted(y * width + x for x, y in red_spots.values())
+    density = wall_density
+    while True:
+        carved = _maze(width, height, red_cells, rnd) if style == "maze" else None
+        passable = bytearray(width * height)
+        for y in range(height):
+            for x in range(width):
+                i = y * width + x
+                mx, my = mirror(x, y)
+                j = my * width + mx
+                if j < i:
+                    passable[i] = passable[j]
+                elif i in reserved:
+                    passable[i] = 1
+                elif carved is not None:
+                    passable[i] = carved[i]
+                elif style == "corridors" and y % CORRIDOR_SPACING == 0:
+                    passable[i] = rnd.random() < DOOR_RATE
+                else:
+                    passable[i] = rnd.random() >= density
+        cmap = CompiledMap(width, height, passable)
+        if _connected(cmap, sorted(reserved)):
+            break
+        density *= 0.9
+
+    game_map = {
+        "width": width,
+        "height": height,
+        "cells": [{"type": "Empty" if ok else "Wall"} for ok in passable],
+    }
+    entities = [
+        _entity(kind, team, *spots[(team, kind)])
+        for team in TEAMS
+        for kind in ("Player", "Base", "Flag")
+    ]
+    return LocalMap(name, game_map, entities)
+
+
+def default_maps() -> Dict[str, LocalMap]:
+    """Return the generated levels served by the local server."""
+    sizes = [(12, 10), (16, 12), (20, 16), (28, 20), (40, 30)]
+    return {
+        f"level-{n}": generate_map(f"level-{n}", w, h, 0.2, seed=n)
+        for n, (w, h) in enumerate(sizes, start=1)
+    }
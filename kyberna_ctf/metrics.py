@@ -0,0 +1,320 @@
+"""Structured performance metrics of game sessions.
+
+A :class:`Metrics` object collects named histograms (decision time, network
+round trips per endpoint, polls per turn, nodes expanded per search, ...)
+and counters such as cache hits and misses.  Every session owns one; the
+session loops make it current with :func:`recording` so that the network
+helpers can report their round trips without it being passed around.
+Each model keeps its own :attr:`~kyberna_ctf.ai.AIBase.metrics`, which the
+session merges in at game end.
+
+The metrics of every finished session are appended as one JSON line to
+:data:`METRICS_FILE`.  The command line tool summarises them per model::
+
+    python -m kyberna_ctf.metrics --models DijkstraAI,RatioAI
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+# File receiving one JSON line per finished session.
+METRICS_FILE = Path("metrics.jsonl")
+# Serialises the appends of concurrent sessions (campaign threads, async
+# sessions) so their lines never interleave.
+_WRITE_LOCK = threading.Lock()
+
+# Ratio between the bounds of neighbouring histogram buckets.  Percentiles
+# are read off the buckets and are accurate to this factor.
+BUCKET_GROWTH = 1.1
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+# Suffixes of the counter pairs that make up a cache hit rate.
+_HITS = ".hits"
+_MISSES = ".misses"
+
+# Metrics of the session running in the current thread or task.
+_CURRENT: ContextVar["Metrics | None"] = ContextVar("kyberna_metrics", default=None)
+
+
+class Histogram:
+    """Distribution of non-negative values in logarithmic buckets.
+
+    Only the bucket counts are kept, so a histogram has a bounded size
+    however many values it sees and histograms of several sessions merge
+    exactly.
+    """
+
+    __slots__ = ("count", "total", "min", "max", "zeros", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # Values of zero or less, which have no logarithmic bucket.
+        self.zeros = 0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self.zeros += 1
+        else:
+            index = math.floor(math.log(value) / _LOG_GROWTH)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """Return the value below which ``fraction`` of the values lie."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = self.zeros
+        if seen > rank:
+            return max(self.min, 0.0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return min(self.max, BUCKET_GROWTH ** (index + 1))
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+
+    def to_json(self) -> Dict:
+        data = {"count": self.count, "sum": self.total}
+        if self.count:
+            data.update(
+                min=self.min,
+                max=self.max,
+                p50=self.percentile(0.5),
+                p90=self.percentile(0.9),
+                p99=self.percentile(0.99),
+                zeros=self.zeros,
+                buckets={str(i): n for i, n in sorted(self.buckets.items())},
+            )
+        return data
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "Histogram":
+        hist = cls()
+        hist.count = data["count"]
+        hist.total = data["sum"]
+        if hist.count:
+            hist.min = data["min"]
+            hist.max = data["max"]
+            hist.zeros = data["zeros"]
+            hist.buckets = {int(i): n for i, n in data["buckets"].items()}
+        return hist
+
+
+class Metrics:
+    """Named histograms and counters; safe to update from several threads."""
+
+    def __init__(self) -> None:
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float) -> None:
+        """Add ``value`` to the histogram ``name``."""
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(value)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add ``n`` to the counter ``name``."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def cache(self, name: str, hit: bool) -> None:
+        """Count a hit or a miss of the cache ``name``."""
+        self.count(name + (_HITS if hit else _MISSES))
+
+    def hit_rates(self) -> Dict[str, float]:
+        """Return the hit rate of every cache with at least one lookup."""
+        counters = self.counters
+        names = {
+            key.rsplit(".", 1)[0] for key in counters if key.endswith((_HITS, _MISSES))
+        }
+        rates = {}
+        for name in sorted(names):
+            hits = counters.get(name + _HITS, 0)
+            total = hits + counters.get(name + _MISSES, 0)
+            if total:
+                rates[name] = hits / total
+        return rates
+
+    def merge(self, other: "Metrics") -> None:
+        with self._lock:
+            for name, hist in other.histograms.items():
+                mine = self.histograms.get(name)
+                if mine is None:
+                    mine = self.histograms[name] = Histogram()
+                mine.merge(hist)
+            for name, n in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_json(self) -> Dict:
+        with self._lock:
+            return {
+                "histograms": {
+                    name: hist.to_json() for name, hist in sorted(self.histograms.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "hit_rates": self.hit_rates(),
+            }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "Metrics":
+        metrics = cls()
+        metrics.histograms = {
+            name: Histogram.from_json(hist) for name, hist in data.get("histograms", {}).items()
+        }
+        metrics.counters = dict(data.get("counters", {}))
+        return metrics
+
+    def summary(self) -> List[str]:
+        """Return one line per histogram, counter and cache."""
+        lines = []
+        for name, hist in sorted(self.histograms.items()):
+            if name.endswith("_time") or name.startswith("rtt "):
+                unit, scale = "ms", 1000.0
+            else:
+                unit, scale = "", 1.0
+            lines.append(
+                f"{name}: n={hist.count} mean {hist.mean * scale:.2f}{unit}"
+                f" p50 {hist.percentile(0.5) * scale:.2f}{unit}"
+                f" p90 {hist.percentile(0.9) * scale:.2f}{unit}"
+                f" max {hist.max * scale:.2f}{unit}"
+            )
+        rates = self.hit_rates()
+        for name, n in sorted(self.counters.items()):
+            if not name.endswith((_HITS, _MISSES)):
+                lines.append(f"{name}: {n}")
+        for name, rate in sorted(rates.items()):
+            lines.append(f"{name} hit rate: {rate * 100:.1f}%")
+        return lines
+
+    # Only the data is copied or pickled, not the lock.
+    def __getstate__(self) -> Dict:
+        return {"histograms": self.histograms, "counters": self.counters}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+# ----------------------------------------------------------------------
+# Current session
+# ----------------------------------------------------------------------
+@contextmanager
+def recording(metrics: Metrics) -> Iterator[Metrics]:
+    """Make ``metrics`` the current metrics of this thread or task."""
+    token = _CURRENT.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _CURRENT.reset(token)
+
+
+def current() -> Metrics | None:
+    return _CURRENT.get()
+
+
+def record_rtt(endpoint: str, seconds: float) -> None:
+    """Add a request round trip to the current metrics, if any."""
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        metrics.observe(f"rtt {endpoint}", seconds)
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+def write_metrics(metrics: Metrics, path: Path | None = None, **info) -> None:
+    """Append ``metrics`` with the session ``info`` as one JSON line."""
+    path = path or METRICS_FILE
+    record = {"time": datetime.now().isoformat(timespec="seconds"), **info}
+    record.update(metrics.to_json())
+    line = json.dumps(record) + "\n"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _WRITE_LOCK, path.open("a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def load_metrics(path: Path | None = None) -> List[Dict]:
+    """Return the session records of a metrics file, skipping broken lines."""
+    records = []
+    with (path or METRICS_FILE).open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarise session metrics per model")
+    parser.add_argument(
+        "file",
+        nargs="?",
+        type=Path,
+        default=METRICS_FILE,
+        help=f"JSON lines file written by the sessions (default: {METRICS_FILE})",
+    )
+    parser.add_argument("--models", help="Comma separated list of models to include")
+    parser.add_argument("--map", help="Only include sessions on this map")
+    args = parser.parse_args()
+
+    try:
+        records = load_metrics(args.file)
+    except OSError as exc:
+        raise SystemExit(str(exc))
+    wanted = {n.strip() for n in args.models.split(",")} if args.models else None
+    per_model: Dict[str, Metrics] = {}
+    sessions: Dict[str, int] = {}
+    for record in records:
+        model = record.get("model", "?")
+        if wanted is not None and model not in wanted:
+            continue
+        if args.map is not None and record.get("map") != args.map:
+            continue
+        per_model.setdefault(model, Metrics()).merge(Metrics.from_json(record))
+        sessions[model] = sessions.get(model, 0) + 1
+    if not per_model:
+        raise SystemExit("No matching sessions.")
+    for model, metrics in sorted(per_model.items()):
+        print(f"{model} ({sessions[model]} sessions)")
+        for line in metrics.summary():
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
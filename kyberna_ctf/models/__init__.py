@@ -4,6 +4,8 @@ from .dijkstra_ai import DijkstraAI
 from .intercept_ai import InterceptAI
 from .intercept_ai2 import InterceptAI2
 from .ratio_ai import RatioAI
+from .lookahead_ai import LookaheadAI
+from .mcts_ai import MCTSAI
 
 ALL_MODELS = {
     "RandomAI": RandomAI,
@@ -12,4 +14,6 @@ ALL_MODELS = {
     "InterceptAI": InterceptAI,
     "InterceptAI2": InterceptAI2,
     "RatioAI": RatioAI,
+    "LookaheadAI": LookaheadAI,
+    "MCTSAI": MCTSAI,
 }
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Dict, List, Optional, Tuple
 
+from ..fields import distance_field, earliest_intercept, static_field
+from ..state import GameState
 from .dijkstra_ai import DijkstraAI
 
 
@@ -13,6 +15,13 @@ class InterceptAI2(DijkstraAI):
     any of their bases.
     """
 
+    _TURN_STATE = DijkstraAI._TURN_STATE + (
+        "_last_pos",
+        "_enemy_flag_pos",
+        "_carrying_flag",
+        "_captures",
+    )
+
     def __init__(self, team_color: str | None = None, mode: str = "dynamic") -> None:
         """Create the AI.
 
@@ -30,30 +39,13 @@ class InterceptAI2(DijkstraAI):
     # ------------------------------------------------------------------
     # Parsing and state tracking
     # ------------------------------------------------------------------
-    def _parse_entities(self, entities: List[Dict]):
-        player = None
-        base = None
-        enemy_player = None
-        enemy_bases = []
-        enemy_flag = None
-        my_flag = None
-        for e in entities:
-            pos = (e["location"]["x"], e["location"]["y"])
-            if e["type"] == "Player":
-                if e["teamColor"] == self.team_color:
-                    player = pos
-                else:
-                    enemy_player = pos
-            elif e["type"] == "Base":
-                if e["teamColor"] == self.team_color:
-                    base = pos
-                else:
-                    enemy_bases.append(pos)
-            elif e["type"] == "Flag":
-                if e["teamColor"] == self.team_color:
-                    my_flag = pos
-                else:
-                    enemy_flag = pos
+    def _parse_entities(self, state: GameState):
+        player = state.coords(state.player)
+        base = state.coords(state.bases[-1]) if state.bases else None
+        enemy_player = state.coords(state.enemy_player)
+        enemy_bases = [state.coords(b) for b in state.enemy_bases]
+        enemy_flag = state.coords(state.enemy_flags[-1]) if state.enemy_flags else None
+        my_flag = state.coords(state.flags[-1]) if state.flags else None
         return player, base, enemy_player, enemy_bases, enemy_flag, my_flag
 
     def _update_flag_state(
@@ -84,60 +76,14 @@ class InterceptAI2(DijkstraAI):
         self._enemy_flag_pos = enemy_flag
         self._last_pos = player
 
+    def observe(self, game_map: Dict, entities: List[Dict], score: Dict | None = None) -> None:
+        state = self.game_state(game_map, entities, score)
+        player, base, _, _, enemy_flag, _ = self._parse_entities(state)
+        self._update_flag_state(player, base, enemy_flag)
+
     # ------------------------------------------------------------------
     # Path helpers
     # ------------------------------------------------------------------
-    def _dijkstra_full(
-        self,
-        game_map: Dict,
-        start: Tuple[int, int],
-        goal: Tuple[int, int],
-    ) -> Optional[Tuple[List[int], List[Tuple[int, int]]]]:
-        from heapq import heappush, heappop
-
-        queue = []
-        heappush(queue, (self._heuristic(start, goal), 0, start))
-        came_from: dict[Tuple[int, int], Tuple[int, int] | None] = {start: None}
-        move_from: dict[Tuple[int, int], int] = {}
-        costs = {start: 0}
-
-        while queue:
-            _, cost, current = heappop(queue)
-            if current == goal:
-                break
-            if cost > costs[current]:
-                continue
-            x, y = current
-            for direction, nx, ny in self._neighbors(game_map, x, y):
-                new_cost = cost + 1
-                if (nx, ny) not in costs or new_cost < costs[(nx, ny)]:
-                    costs[(nx, ny)] = new_cost
-                    came_from[(nx, ny)] = current
-                    move_from[(nx, ny)] = direction
-                    priority = new_cost + self._heuristic((nx, ny), goal)
-                    heappush(queue, (priority, new_cost, (nx, ny)))
-
-        if goal not in came_from:
-            return None
-
-        path_dirs: List[int] = []
-        path_pos: List[Tuple[int, int]] = [goal]
-        current = goal
-        while current != start:
-            prev = came_from[current]
-            if prev is None:
-                break
-            path_dirs.append(move_from[current])
-            current = prev
-            path_pos.append(current)
-        path_dirs.reverse()
-        path_pos.reverse()
-        return path_dirs, path_pos
-
-    def _distance(self, game_map: Dict, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[int]:
-        path = self._dijkstra(game_map, start, goal)
-        return len(path) if path is not None else None
-
     def _compute_intercept(
         self,
         game_map: Dict,
@@ -145,47 +91,48 @@ class InterceptAI2(DijkstraAI):
         enemy_player: Tuple[int, int] | None,
         enemy_bases: List[Tuple[int, int]],
     ) -> Optional[Tuple[int, int]]:
-        """Find the earliest point where we can intercept the enemy."""
+        """Find the earliest point where we can intercept the enemy.
+
+        All enemy bases are considered at once: every cell on a shortest
+        enemy path to any base is checked against our distance field.
+        """
         if enemy_player is None or not enemy_bases:
             return None
-
-        best_point = None
-        best_enemy_eta = None
-
-        for base in enemy_bases:
-            res = self._dijkstra_full(game_map, enemy_player, base)
-            if res is None:
-                continue
-            _, pos_seq = res
-            for eta_enemy, pos in enumerate(pos_seq):
-                if self._is_wall(game_map, pos[0], pos[1]):
-                    continue
-                dist_self = self._distance(game_map, player, pos)
-                if dist_self is not None and dist_self <= eta_enemy:
-                    if best_enemy_eta is None or eta_enemy < best_enemy_eta:
-                        best_enemy_eta = eta_enemy
-                        best_point = pos
-                    break  # earliest intercept on this path
-
-        return best_point
+        cmap = self.compiled_map(game_map)
+        own = distance_field(cmap, [cmap.index(*player)])
+        enemy = distance_field(cmap, [cmap.index(*enemy_player)])
+        goals = [cmap.index(*b) for b in enemy_bases]
+        goal_fields = [static_field(cmap, g) for g in goals]
+        cell = earliest_intercept(own, enemy, goals, goal_fields)
+        return cmap.coords(cell) if cell is not None else None
 
     # ------------------------------------------------------------------
     # Decision logic
     # ------------------------------------------------------------------
-    def choose_move(self, game_map: Dict, entities: List[Dict], score: Dict | None = None) -> int:
-        player, base, enemy_player, enemy_bases, enemy_flag, my_flag = self._parse_entities(entities)
+    def choose_move(
+        self,
+        game_map: Dict,
+        entities: List[Dict],
+        score: Dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        state = self.game_state(game_map, entities, score)
+        player, base, enemy_player, enemy_bases, enemy_flag, my_flag = self._parse_entities(state)
         self._update_flag_state(player, base, enemy_flag)
 
         if player is None or base is None:
             return 1
 
         if self._carrying_flag:
-            path = self._dijkstra(game_map, player, base)
-            return path[0] if path else 1
+            move = self._first_move(game_map, player, base)
+            return move if move is not None else 1
 
-        intercept_point = self._compute_intercept(
-            game_map, player, enemy_player, enemy_bases
-        )
+        # The intercept analysis is optional; skip it when time is up.
+        intercept_point = None
+        if not self.out_of_time(deadline):
+            intercept_point = self._compute_intercept(
+                game_map, player, enemy_player, enemy_bases
+            )
 
         intercept_needed = False
         if intercept_point is not None:
@@ -199,9 +146,9 @@ class InterceptAI2(DijkstraAI):
                 intercept_needed = True
 
         if intercept_point is not None and intercept_needed:
-            path = self._dijkstra(game_map, player, intercept_point)
-            if path:
-                intercept_len = len(path)
+            move = self._first_move(game_map, player, intercept_point)
+            if move is not None:
+                intercept_len = self._distance(game_map, player, intercept_point)
                 capture_len = None
                 if enemy_flag is not None:
                     d1 = self._distance(game_map, player, enemy_flag)
@@ -209,6 +156,6 @@ class InterceptAI2(DijkstraAI):
                     if d1 is not None and d2 is not None:
                         capture_len = d1 + d2
                 if capture_len is None or intercept_len <= capture_len:
-                    return path[0]
+                    return move
 
-        return super().choose_move(game_map, entities, score)
+        return super().choose_move(game_map, state, score, deadline)
@@ -0,0 +1,290 @@
+"""Depth-limited lookahead over both players' moves."""
+
+from __future__ import annotations
+
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ..distances import DistanceTable
+from ..fields import FieldTable, distance_field
+from ..hexmap import NO_CELL, CompiledMap
+from .dijkstra_ai import DijkstraAI
+
+# Flag that is neither on the map nor carried because its spawn is unknown.
+GONE = -2
+# Search time per move when ``choose_move`` gets no earlier deadline.
+DEFAULT_THINK_TIME = 0.05
+# Deepest iteration of the iterative deepening, in turns.
+MAX_DEPTH = 8
+# Entries kept in the transposition table; the least recently used go first.
+TT_SIZE = 1 << 17
+# Value of one capture.  It must exceed any difference of the race term,
+# which is bounded by the number of cells of the largest map.
+CAPTURE_WEIGHT = 10_000
+# Nodes searched between two looks at the clock.
+CHECK_INTERVAL = 512
+
+INF = float("inf")
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+
+class _Timeout(Exception):
+    """Raised inside the search when the deadline has passed."""
+
+
+class LookaheadAI(DijkstraAI):
+    """Alpha-beta or expectimax search over simultaneous turns.
+
+    A turn is searched as our move followed by the enemy's reply; in
+    ``"minimax"`` mode the worst reply counts, in ``"expectimax"`` mode the
+    average over all replies.  Leaves are scored by the capture race read
+    from the distance table.  Iterative deepening stops at the deadline and
+    positions are cached in a Zobrist-hashed transposition table with LRU
+    eviction that is kept across turns.
+    """
+
+    _SHARED = DijkstraAI._SHARED + ("_layout", "_tt", "_table")
+    _TURN_STATE = DijkstraAI._TURN_STATE + ("_spawns",)
+    # The search depth depends on the time it gets.
+    deterministic = False
+
+    def __init__(
+        self,
+        team_color: str | None = None,
+        mode: str = "minimax",
+        think_time: float = DEFAULT_THINK_TIME,
+    ) -> None:
+        super().__init__(team_color)
+        if mode not in ("minimax", "expectimax"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        self.mode = mode
+        self.think_time = think_time
+        # Search statistics accumulated over the game.
+        self.nodes = 0
+        self.search_time = 0.0
+        self.searches = 0
+        self.depth_sum = 0
+        self.tt_hits = 0
+        self.tt_misses = 0
+        self._tt: "OrderedDict[int, Tuple[int, float, int, int]]" = OrderedDict()
+        self._layout: Dict | None = None
+        self._table: DistanceTable | FieldTable | None = None
+        self._spawns: Tuple[int, int] | None = None
+        self._deadline = 0.0
+
+    # ------------------------------------------------------------------
+    # Layout data
+    # ------------------------------------------------------------------
+    def _prepare(self, cmap: CompiledMap, bases, enemy_bases) -> Dict:
+        layout = self._layout
+        if layout is not None and layout["cmap"] is cmap:
+            return layout
+        size = cmap.size
+        rng = random.Random(size)
+        # One key per cell and role; the two extra slots at the end are hit
+        # by the negative NO_CELL and GONE markers.
+        zobrist = [[rng.getrandbits(64) for _ in range(size + 2)] for _ in range(4)]
+        moves = []
+        for cell in range(size):
+            adjacency = cmap.adjacency[cell]
+            options = list(adjacency)
+            if len(options) < 6:
+                # Walking into a wall keeps the player in place.
+                blocked = next(d for d in range(1, 7) if cmap.neighbor(cell, d) == NO_CELL)
+                options.append((blocked, cell))
+            moves.append(tuple(options))
+        far = size
+        own = distance_field(cmap, bases)
+        enemy = distance_field(cmap, enemy_bases)
+        layout = self._layout = {
+            "cmap": cmap,
+            "zobrist": zobrist,
+            "moves": moves,
+            "far": far,
+            # Plain ints: NumPy scalars would slow down every evaluation.
+            "base_dist": [min(d, far) for d in own.tolist()],
+            "enemy_base_dist": [min(d, far) for d in enemy.tolist()],
+            "bases": frozenset(bases),
+            "enemy_bases": frozenset(enemy_bases),
+        }
+        self._tt.clear()
+        return layout
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _evaluate(self, me: int, en: int, mflag: int, eflag: int) -> float:
+        """Return how many turns earlier we score than the enemy."""
+        layout = self._layout
+        far = layout["far"]
+        distance = self._table.distance
+
+        def time_to_score(pos: int, flag: int, base_dist: List[int]) -> int:
+            if flag == NO_CELL:
+                return base_dist[pos]
+            if flag == GONE:
+                return far
+            d = distance(pos, flag)
+            return far if d is None else min(far, d + base_dist[flag])
+
+        mine = time_to_score(me, eflag, layout["base_dist"])
+        theirs = time_to_score(en, mflag, layout["enemy_base_dist"])
+        return theirs - mine
+
+    def _advance(self, me, en, me2, en2, mflag, eflag) -> Tuple[int, int, int]:
+        """Apply the flag rules to a joint move; return ``(gain, mflag, eflag)``."""
+        mspawn, espawn = self._spawns or (GONE, GONE)
+        if me2 == en2 or (me2 == en and en2 == me):
+            if eflag == NO_CELL:
+                eflag = espawn
+            if mflag == NO_CELL:
+                mflag = mspawn
+        gain = 0
+        if eflag >= 0 and me2 == eflag:
+            eflag = NO_CELL
+        if eflag == NO_CELL and me2 in self._layout["bases"]:
+            gain += CAPTURE_WEIGHT
+            eflag = espawn
+        if mflag >= 0 and en2 == mflag:
+            mflag = NO_CELL
+        if mflag == NO_CELL and en2 in self._layout["enemy_bases"]:
+            gain -= CAPTURE_WEIGHT
+            mflag = mspawn
+        return gain, mflag, eflag
+
+    def _reply(self, me, en, me2, mflag, eflag, depth, alpha, beta) -> float:
+        """Value of our step to ``me2`` over the enemy's replies."""
+        moves = self._layout["moves"][en]
+        if self.mode == "expectimax":
+            total = 0.0
+            for _, en2 in moves:
+                gain, mf2, ef2 = self._advance(me, en, me2, en2, mflag, eflag)
+                total += gain + self._value(me2, en2, mf2, ef2, depth - 1, -INF, INF)
+            return total / len(moves)
+        worst = INF
+        for _, en2 in moves:
+            gain, mf2, ef2 = self._advance(me, en, me2, en2, mflag, eflag)
+            value = gain + self._value(
+                me2, en2, mf2, ef2, depth - 1, alpha - gain, min(beta, worst) - gain
+            )
+            if value < worst:
+                worst = value
+                if worst <= alpha:
+                    break
+        return worst
+
+    def _value(self, me, en, mflag, eflag, depth, alpha, beta) -> float:
+        """Value of a position relative to the captures made so far."""
+        self.nodes += 1
+        if not self.nodes % CHECK_INTERVAL and self.out_of_time(self._deadline):
+            raise _Timeout
+        if depth == 0:
+            return self._evaluate(me, en, mflag, eflag)
+        zobrist = self._layout["zobrist"]
+        key = zobrist[0][me] ^ zobrist[1][en] ^ zobrist[2][mflag] ^ zobrist[3][eflag]
+        tt = self._tt
+        hint = None
+        entry = tt.get(key)
+        if entry is None:
+            self.tt_misses += 1
+        else:
+            self.tt_hits += 1
+            tt.move_to_end(key)
+            e_depth, e_value, e_flag, hint = entry
+            if e_depth >= depth and (
+                e_flag == _EXACT
+                or (e_flag == _LOWER and e_value >= beta)
+                or (e_flag == _UPPER and e_value <= alpha)
+            ):
+                return e_value
+
+        moves = self._layout["moves"][me]
+        if hint is not None:
+            moves = sorted(moves, key=lambda m: m[0] != hint)
+        alpha0 = alpha
+        best = -INF
+        best_move = moves[0][0]
+        for direction, me2 in moves:
+            value = self._reply(me, en, me2, mflag, eflag, depth, alpha, beta)
+            if value > best:
+                best, best_move = value, direction
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha0:
+            flag = _UPPER
+        elif best >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        tt[key] = (depth, best, flag, best_move)
+        tt.move_to_end(key)
+        if len(tt) > TT_SIZE:
+            tt.popitem(last=False)
+        return best
+
+    # ------------------------------------------------------------------
+    # Decision logic
+    # ------------------------------------------------------------------
+    def choose_move(
+        self,
+        game_map: Dict,
+        entities: List[Dict],
+        score: Dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        state = self.game_state(game_map, entities, score)
+        if state.player == NO_CELL or state.enemy_player == NO_CELL or not state.bases:
+            return super().choose_move(game_map, state, score, deadline)
+        cmap = self.compiled_map(game_map)
+        self._prepare(cmap, state.bases, state.enemy_bases)
+        self._table = self.distance_table(cmap)
+        if self._spawns is None and state.flags and state.enemy_flags:
+            self._spawns = (state.flags[0], state.enemy_flags[0])
+        me, en = state.player, state.enemy_player
+        mflag = state.flags[0] if state.flags else NO_CELL
+        eflag = state.enemy_flags[0] if state.enemy_flags else NO_CELL
+
+        start = time.perf_counter()
+        limit = start + self.think_time
+        self._deadline = limit if deadline is None else min(deadline, limit)
+        nodes = self.nodes
+        hits, misses = self.tt_hits, self.tt_misses
+        best_move: Optional[int] = None
+        depth = 0
+        for d in range(1, MAX_DEPTH + 1):
+            try:
+                self._value(me, en, mflag, eflag, d, -INF, INF)
+            except _Timeout:
+                break
+            entry = self._tt.get(self._root_key(me, en, mflag, eflag))
+            if entry is not None:
+                best_move = entry[3]
+            depth = d
+        self.searches += 1
+        self.depth_sum += depth
+        self.search_time += time.perf_counter() - start
+        metrics = self.metrics
+        metrics.observe("lookahead.nodes", self.nodes - nodes)
+        metrics.observe("lookahead.depth", depth)
+        metrics.count("lookahead.tt.hits", self.tt_hits - hits)
+        metrics.count("lookahead.tt.misses", self.tt_misses - misses)
+        if best_move is None:
+            return super().choose_move(game_map, state, score, deadline)
+        return best_move
+
+    def _root_key(self, me, en, mflag, eflag) -> int:
+        zobrist = self._layout["zobrist"]
+        return zobrist[0][me] ^ zobrist[1][en] ^ zobrist[2][mflag] ^ zobrist[3][eflag]
+
+    def describe(self) -> str:
+        rate = self.nodes / self.search_time if self.search_time else 0.0
+        depth = self.depth_sum / self.searches if self.searches else 0.0
+        return (
+            f"{self.nodes} nodes in {self.search_time:.2f}s ({rate:,.0f} nodes/s), "
+            f"mean depth {depth:.1f}"
+        )
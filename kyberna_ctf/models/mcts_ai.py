@@ -0,0 +1,267 @@
+"""Monte Carlo tree search over both players' moves."""
+
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, List, Tuple
+
+from ..hexmap import NO_CELL
+from ..rollouts import DISCOUNT, RolloutBoard, Start, init_pool, simulate_in_pool
+from .dijkstra_ai import DijkstraAI
+
+# Search time per move when ``choose_move`` gets no earlier deadline.
+DEFAULT_THINK_TIME = 0.1
+# Environment variable with the rollout processes used unless given
+# explicitly; unset, 0 or 1 keeps rollouts in the model's own process.
+WORKERS_ENV = "KYBERNA_MCTS_WORKERS"
+# UCB exploration constant for rewards between 0 and 1.
+EXPLORATION = 0.3
+# Virtual visits and their mean reward given to the greedy move of a new node.
+PRIOR_VISITS = 30
+PRIOR_VALUE = 0.6
+# Leaves selected per batch of rollouts, and rollouts per leaf.
+BATCH_LEAVES = 32
+ROLLOUTS_PER_LEAF = 4
+# Deepest tree level, in turns.
+MAX_TREE_DEPTH = 12
+# Nodes kept between turns before the tree is dropped.
+NODE_LIMIT = 200_000
+
+# (me, en, we_carry, they_carry)
+Key = Tuple[int, int, bool, bool]
+
+
+def _default_workers() -> int:
+    value = os.environ.get(WORKERS_ENV, "").strip()
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring {WORKERS_ENV}={value!r}, not a number of processes")
+        return 0
+
+
+class _Node:
+    """Decoupled UCT statistics: one set of arms per player."""
+
+    __slots__ = ("visits", "my_n", "my_w", "en_n", "en_w")
+
+    def __init__(self, my_moves: int, en_moves: int) -> None:
+        self.visits = 0
+        self.my_n = [0] * my_moves
+        self.my_w = [0.0] * my_moves
+        self.en_n = [0] * en_moves
+        self.en_w = [0.0] * en_moves
+
+
+def _ucb(n: List[int], w: List[float], visits: int) -> int:
+    log = math.log(visits + 1)
+    best = 0
+    best_value = -1.0
+    for i, count in enumerate(n):
+        if not count:
+            return i
+        value = w[i] / count + EXPLORATION * math.sqrt(log / count)
+        if value > best_value:
+            best, best_value = i, value
+    return best
+
+
+class MCTSAI(DijkstraAI):
+    """UCT search over simultaneous moves with epsilon-greedy rollouts.
+
+    Each tree node keeps separate move statistics for both players
+    (decoupled UCT).  Leaves are selected in batches with a virtual loss and
+    scored with rollouts from :class:`~kyberna_ctf.rollouts.RolloutBoard`.
+    With ``workers`` above one, the rollouts run in a process pool with one
+    batch per worker in flight while the next batch is selected; by default
+    their number is read from :data:`WORKERS_ENV`.  Nodes are keyed by game
+    state and kept between turns, so the subtree of the state that was
+    actually reached is reused.
+    """
+
+    _SHARED = DijkstraAI._SHARED + ("_board", "_board_map", "_nodes", "_pool")
+    _TURN_STATE = DijkstraAI._TURN_STATE + ("_spawns",)
+    # Random rollouts.
+    deterministic = False
+
+    def __init__(
+        self,
+        team_color: str | None = None,
+        think_time: float = DEFAULT_THINK_TIME,
+        workers: int | None = None,
+    ) -> None:
+        super().__init__(team_color)
+        self.think_time = think_time
+        self.workers = _default_workers() if workers is None else workers
+        # Search statistics accumulated over the game.
+        self.rollouts = 0
+        self.search_time = 0.0
+        self.searches = 0
+        self._board: RolloutBoard | None = None
+        self._board_map = None
+        self._nodes: Dict[Key, _Node] = {}
+        self._pool: ProcessPoolExecutor | None = None
+        self._spawns: Tuple[int, int] | None = None
+        self._seed = random.Random()
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+    def _prepare(self, cmap, state) -> RolloutBoard:
+        if self._board is not None and self._board_map is cmap:
+            return self._board
+        self._board = RolloutBoard(cmap, state.bases, state.enemy_bases, self._spawns)
+        self._board_map = cmap
+        self._nodes.clear()
+        self.close()
+        if self.workers > 1 and not mp.current_process().daemon:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_pool,
+                initargs=(self._board,),
+            )
+        return self._board
+
+    def close(self) -> None:
+        """Stop the rollout processes, if any."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _node(self, key: Key) -> _Node:
+        board = self._board
+        me, en, mc, ec = key
+        mine = board.options[me]
+        theirs = board.options[en]
+        node = _Node(len(mine), len(theirs))
+        # Both greedy steps start with a few virtual wins so that the search
+        # only leaves them when the rollouts say so.
+        greedy = board.hop[mc][me]
+        for i, (_, cell) in enumerate(mine):
+            if cell == greedy:
+                node.my_n[i] = PRIOR_VISITS
+                node.my_w[i] = PRIOR_VISITS * PRIOR_VALUE
+        greedy = board.enemy_hop[ec][en]
+        for j, (_, cell) in enumerate(theirs):
+            if cell == greedy:
+                node.en_n[j] = PRIOR_VISITS
+                node.en_w[j] = PRIOR_VISITS * PRIOR_VALUE
+        node.visits = PRIOR_VISITS
+        self._nodes[key] = node
+        return node
+
+    def _select(self, key: Key) -> Tuple[List[tuple], Start]:
+        """Descend from ``key`` to a new or deepest node, adding virtual visits."""
+        board = self._board
+        options = board.options
+        nodes = self._nodes
+        path = []
+        gain = 0.0
+        weight = 1.0
+        for _ in range(MAX_TREE_DEPTH):
+            node = nodes.get(key)
+            if node is None:
+                self._node(key)
+                break
+            i = _ucb(node.my_n, node.my_w, node.visits)
+            j = _ucb(node.en_n, node.en_w, node.visits)
+            node.visits += 1
+            node.my_n[i] += 1
+            node.en_n[j] += 1
+            path.append((node, i, j))
+            me, en, mc, ec = key
+            me2 = options[me][i][1]
+            en2 = options[en][j][1]
+            g, mc, ec = board.advance(me, en, me2, en2, mc, ec)
+            gain += g * weight
+            weight *= DISCOUNT
+            key = (me2, en2, mc, ec)
+        return path, key + (gain, weight)
+
+    def _backup(self, batch: List[tuple], rewards: List[float]) -> None:
+        self.rollouts += len(batch) * ROLLOUTS_PER_LEAF
+        for (path, _), reward in zip(batch, rewards):
+            for node, i, j in path:
+                node.my_w[i] += reward
+                node.en_w[j] += 1.0 - reward
+
+    def _search(self, root: Key, deadline: float) -> None:
+        if root not in self._nodes:
+            self._node(root)
+        board = self._board
+        pool = self._pool
+        # Batches whose rollouts run in the pool while the next ones are selected.
+        pending: Deque[Tuple[List[tuple], Future]] = deque()
+        while not self.out_of_time(deadline):
+            batch = [self._select(root) for _ in range(BATCH_LEAVES)]
+            starts = [start for _, start in batch]
+            seed = self._seed.getrandbits(32)
+            if pool is None:
+                self._backup(batch, board.simulate(starts, ROLLOUTS_PER_LEAF, seed))
+                continue
+            pending.append(
+                (batch, pool.submit(simulate_in_pool, starts, ROLLOUTS_PER_LEAF, seed))
+            )
+            if len(pending) >= self.workers:
+                batch, future = pending.popleft()
+                self._backup(batch, future.result())
+        for batch, future in pending:
+            self._backup(batch, future.result())
+
+    # ------------------------------------------------------------------
+    # Decision logic
+    # ------------------------------------------------------------------
+    def choose_move(
+        self,
+        game_map: Dict,
+        entities: List[Dict],
+        score: Dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        state = self.game_state(game_map, entities, score)
+        if self._spawns is None and state.flags and state.enemy_flags:
+            self._spawns = (state.flags[0], state.enemy_flags[0])
+        if (
+            state.player == NO_CELL
+            or state.enemy_player == NO_CELL
+            or not state.bases
+            or not state.enemy_bases
+            or self._spawns is None
+        ):
+            return super().choose_move(game_map, state, score, deadline)
+        cmap = self.compiled_map(game_map)
+        board = self._prepare(cmap, state)
+        if len(self._nodes) > NODE_LIMIT:
+            self._nodes.clear()
+
+        start = time.perf_counter()
+        limit = start + self.think_time
+        root = (state.player, state.enemy_player, not state.enemy_flags, not state.flags)
+        rollouts = self.rollouts
+        self.metrics.cache("mcts.tree", root in self._nodes)
+        self._search(root, limit if deadline is None else min(deadline, limit))
+        self.searches += 1
+        self.search_time += time.perf_counter() - start
+        self.metrics.observe("mcts.rollouts", self.rollouts - rollouts)
+
+        node = self._nodes[root]
+        best = max(range(len(node.my_n)), key=node.my_n.__getitem__)
+        return board.options[state.player][best][0]
+
+    def describe(self) -> str:
+        rate = self.rollouts / self.search_time if self.search_time else 0.0
+        return (
+            f"{self.rollouts} rollouts in {self.search_time:.2f}s "
+            f"({rate:,.0f} rollouts/s), {len(self._nodes)} tree nodes"
+        )
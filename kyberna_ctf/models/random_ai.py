@@ -5,8 +5,16 @@ import random
 class RandomAI(AIBase):
     """A trivial AI that chooses a random valid direction."""
 
+    deterministic = False
+
     def __init__(self, team_color: str | None = None):
         super().__init__(team_color)
 
-    def choose_move(self, game_map: dict, entities: list, score: dict | None = None) -> int:
+    def choose_move(
+        self,
+        game_map: dict,
+        entities: list,
+        score: dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
         return random.randint(1, 6)
@@ -2,49 +2,47 @@
 
 from __future__ import annotations
 
-from collections import deque
 import random
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from .dijkstra_ai import DijkstraAI, DIRS
+from ..fields import distance_field, proximity_costs
+from ..planner import IncrementalPlanner
+from ..state import GameState
+from .dijkstra_ai import DijkstraAI
+
+# Distance from the enemy beyond which it no longer adds to the step cost.
+# Keeping the danger term local lets the incremental planner repair its
+# route around the enemy instead of replanning the whole map every turn.
+DANGER_RADIUS = 6
 
 
 class RatioAI(DijkstraAI):
     """AI that adjusts aggressiveness based on the current score ratio."""
 
+    _SHARED = DijkstraAI._SHARED + ("_route_planner",)
+    _TURN_STATE = DijkstraAI._TURN_STATE + (
+        "_last_pos",
+        "_enemy_flag_pos",
+        "_carrying_flag",
+    )
+
     def __init__(self, team_color: str | None = None) -> None:
         super().__init__(team_color)
         self._last_pos: Optional[Tuple[int, int]] = None
         self._enemy_flag_pos: Optional[Tuple[int, int]] = None
         self._carrying_flag = False
+        self._route_planner: IncrementalPlanner | None = None
 
     # ------------------------------------------------------------------
     # Helper methods
     # ------------------------------------------------------------------
-    def _parse_entities(self, entities: List[Dict]):
-        player = None
-        base = None
-        enemy_player = None
-        enemy_base = None
-        enemy_flag = None
-        my_flag = None
-        for e in entities:
-            pos = (e["location"]["x"], e["location"]["y"])
-            if e["type"] == "Player":
-                if e["teamColor"] == self.team_color:
-                    player = pos
-                else:
-                    enemy_player = pos
-            elif e["type"] == "Base":
-                if e["teamColor"] == self.team_color:
-                    base = pos
-                else:
-                    enemy_base = pos
-            elif e["type"] == "Flag":
-                if e["teamColor"] == self.team_color:
-                    my_flag = pos
-                else:
-                    enemy_flag = pos
+    def _parse_entities(self, state: GameState):
+        player = state.coords(state.player)
+        base = state.coords(state.bases[-1]) if state.bases else None
+        enemy_player = state.coords(state.enemy_player)
+        enemy_base = state.coords(state.enemy_bases[-1]) if state.enemy_bases else None
+        enemy_flag = state.coords(state.enemy_flags[-1]) if state.enemy_flags else None
+        my_flag = state.coords(state.flags[-1]) if state.flags else None
         return player, base, enemy_player, enemy_base, enemy_flag, my_flag
 
     def _update_flag_state(
@@ -73,59 +71,41 @@ class RatioAI(DijkstraAI):
         self._enemy_flag_pos = enemy_flag
         self._last_pos = player
 
-    def _distance_field(self, game_map: Dict, start: Tuple[int, int] | None):
-        w, h = game_map["width"], game_map["height"]
-        dist = [[None for _ in range(w)] for _ in range(h)]
-        if start is None:
-            return dist
-        q = deque([start])
-        dist[start[1]][start[0]] = 0
-        while q:
-            x, y = q.popleft()
-            d = dist[y][x]
-            for _, nx, ny in self._neighbors(game_map, x, y):
-                if dist[ny][nx] is None:
-                    dist[ny][nx] = d + 1
-                    q.append((nx, ny))
-        return dist
+    def observe(self, game_map: Dict, entities: List[Dict], score: Dict | None = None) -> None:
+        state = self.game_state(game_map, entities, score)
+        player, base, _, _, enemy_flag, _ = self._parse_entities(state)
+        self._update_flag_state(player, base, enemy_flag)
+
+    def _distance_field(self, game_map: Dict, start: Tuple[int, int] | None) -> Sequence[int]:
+        """Return BFS distances from ``start`` to every cell (flat, row-major).
+
+        Unreachable cells hold :data:`~kyberna_ctf.distances.UNREACHABLE`.
+        """
+        cmap = self.compiled_map(game_map)
+        sources = [] if start is None else [cmap.index(*start)]
+        return distance_field(cmap, sources)
 
     def _weighted_a_star(
         self,
         game_map: Dict,
         start: Tuple[int, int],
         goal: Tuple[int, int],
-        danger: List[List[Optional[int]]],
-        opp: List[List[Optional[int]]],
+        danger: Sequence[int],
+        opp: Sequence[int],
         alpha: float,
         beta: float,
     ) -> List[int] | None:
-        from heapq import heappush, heappop
-
-        queue = []
-        heappush(queue, (0 + self._heuristic(start, goal), 0, start, []))
-        costs = {start: 0.0}
-
-        while queue:
-            _, cost, current, path = heappop(queue)
-            if current == goal:
-                return path
-            if cost > costs[current]:
-                continue
-            x, y = current
-            for direction, nx, ny in self._neighbors(game_map, x, y):
-                dval = danger[ny][nx]
-                oval = opp[ny][nx]
-                cell_cost = 1.0
-                if dval is not None:
-                    cell_cost += alpha * (1.0 / (dval + 1))
-                if oval is not None:
-                    cell_cost -= beta * (1.0 / (oval + 1))
-                new_cost = cost + cell_cost
-                if (nx, ny) not in costs or new_cost < costs[(nx, ny)]:
-                    costs[(nx, ny)] = new_cost
-                    priority = new_cost + self._heuristic((nx, ny), goal)
-                    heappush(queue, (priority, new_cost, (nx, ny), path + [direction]))
-        return None
+        cmap = self.compiled_map(game_map)
+        planner = self._route_planner
+        if planner is None or planner.cmap is not cmap:
+            planner = self._route_planner = IncrementalPlanner(cmap)
+        cell_cost = proximity_costs(danger, opp, alpha, beta, DANGER_RADIUS)
+        expanded = planner.expanded
+        found = planner.plan(cmap.index(*start), cmap.index(*goal), cell_cost)
+        self.metrics.observe("weighted_a_star.expanded", planner.expanded - expanded)
+        if not found:
+            return None
+        return planner.path()
 
     def _coeffs_for_ratio(self, ratio: float) -> Tuple[float, float]:
         if ratio < 1.0:
@@ -186,7 +166,11 @@ class RatioAI(DijkstraAI):
     # Decision logic
     # ------------------------------------------------------------------
     def choose_move(
-        self, game_map: Dict, entities: List[Dict], score: Dict | None = None
+        self,
+        game_map: Dict,
+        entities: List[Dict],
+        score: Dict | None = None,
+        deadline: float | None = None,
     ) -> int:
         if score is None:
             score = {}
@@ -198,7 +182,7 @@ class RatioAI(DijkstraAI):
             enemy_base,
             enemy_flag,
             my_flag,
-        ) = self._parse_entities(entities)
+        ) = self._parse_entities(self.game_state(game_map, entities, score))
 
         self._update_flag_state(player, base, enemy_flag)
 
@@ -248,6 +232,8 @@ class RatioAI(DijkstraAI):
         for direction, (sx, sy) in neighbors.items():
             if direction == best_move:
                 continue
+            if self.out_of_time(deadline):
+                break
             ratio_alt = self._evaluate_move(
                 game_map,
                 (sx, sy),
@@ -1,62 +1,64 @@
 from collections import deque
 from ..ai import AIBase
-
-# Direction mapping for a hexagonal grid using axial coordinates
-# 1: up, 2: top-right, 3: bottom-right, 4: down, 5: bottom-left, 6: top-left
-DIRS = {
-    1: (0, -1),
-    2: (1, -1),
-    3: (1, 0),
-    4: (0, 1),
-    5: (-1, 1),
-    6: (-1, 0),
-}
+from ..state import GameState
 
 
 class ShortestPathAI(AIBase):
     """Move to the nearest flag, return it to base, repeat."""
 
+    _TURN_STATE = AIBase._TURN_STATE + ("_path",)
+
     def __init__(self, team_color: str | None = None):
-        self.team_color = team_color
+        super().__init__(team_color)
         self._path: list[int] = []
 
     def _is_wall(self, game_map: dict, x: int, y: int) -> bool:
-        w = game_map["width"]
-        cells = game_map["cells"]
-        return cells[y * w + x]["type"] == "Wall"
+        return self.compiled_map(game_map).is_wall(x, y)
 
     def _shortest_path(self, game_map: dict, start: tuple[int, int], goal: tuple[int, int]) -> list[int] | None:
-        w, h = game_map["width"], game_map["height"]
-        queue = deque([(start, [])])
-        visited = {start}
+        cmap = self.compiled_map(game_map)
+        w = cmap.width
+        adjacency = cmap.adjacency
+        start_idx = start[1] * w + start[0]
+        goal_idx = goal[1] * w + goal[0]
+        # Predecessor and incoming direction per cell; the path is rebuilt
+        # from the goal instead of being copied along every edge.
+        parent = [-1] * cmap.size
+        via = [0] * cmap.size
+        parent[start_idx] = start_idx
+        queue = deque([start_idx])
         while queue:
-            (x, y), path = queue.popleft()
-            if (x, y) == goal:
+            current = queue.popleft()
+            if current == goal_idx:
+                path = []
+                while current != start_idx:
+                    path.append(via[current])
+                    current = parent[current]
+                path.reverse()
                 return path
-            for direction, (dx, dy) in DIRS.items():
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < w and 0 <= ny < h and not self._is_wall(game_map, nx, ny):
-                    if (nx, ny) not in visited:
-                        visited.add((nx, ny))
-                        queue.append(((nx, ny), path + [direction]))
+            for direction, nxt in adjacency[current]:
+                if parent[nxt] < 0:
+                    parent[nxt] = current
+                    via[nxt] = direction
+                    queue.append(nxt)
         return None
 
-    def _select_targets(self, entities: list[dict]):
-        player = None
-        base = None
-        flags = []
-        for e in entities:
-            if e["type"] == "Player" and e["teamColor"] == self.team_color:
-                player = (e["location"]["x"], e["location"]["y"])
-            elif e["type"] == "Base" and e["teamColor"] == self.team_color:
-                base = (e["location"]["x"], e["location"]["y"])
-            elif e["type"] == "Flag" and e["teamColor"] != self.team_color:
-                flags.append((e["location"]["x"], e["location"]["y"]))
+    def _select_targets(self, state: GameState):
+        player = state.coords(state.player)
+        base = state.coords(state.bases[-1]) if state.bases else None
+        flags = [state.coords(f) for f in state.enemy_flags]
         return player, base, flags
 
-    def choose_move(self, game_map: dict, entities: list, score: dict | None = None) -> int:
+    def choose_move(
+        self,
+        game_map: dict,
+        entities: list,
+        score: dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
         if not self._path:
-            player, base, flags = self._select_targets(entities)
+            state = self.game_state(game_map, entities, score)
+            player, base, flags = self._select_targets(state)
             if player is None or base is None or not flags:
                 return 1
 
@@ -1,19 +1,46 @@
 """HTTP helpers for interacting with the CTF server."""
 
+import os
+import threading
+import time
+
 import requests
 
-BASE_URL = "https://ctf.kyberna.cz"
+from .metrics import record_rtt
+
+# Server to talk to.  Point ``KYBERNA_CTF_URL`` at a local server started with
+# ``python -m kyberna_ctf.server`` to play offline.
+BASE_URL = os.environ.get("KYBERNA_CTF_URL", "https://ctf.kyberna.cz").rstrip("/")
+
+# Reuse a session so that HTTP connections are kept alive.  This eliminates
+# the overhead of creating a new TCP/TLS connection for every request which
+# noticeably improves responsiveness when the AI is polling the server in a
+# tight loop.  ``requests.Session`` is not thread-safe, so every thread (e.g.
+# each game started by ``run_games``) gets its own.
+_LOCAL = threading.local()
+
 
-# Reuse a single session so that HTTP connections are kept alive.  This
-# eliminates the overhead of creating a new TCP/TLS connection for every
-# request which noticeably improves responsiveness when the AI is polling the
-# server in a tight loop.
-_SESSION = requests.Session()
+def _session() -> requests.Session:
+    session = getattr(_LOCAL, "session", None)
+    if session is None:
+        session = _LOCAL.session = requests.Session()
+    return session
+
+
+def set_base_url(url: str) -> None:
+    """Direct all further requests to ``url``."""
+    global BASE_URL
+    BASE_URL = url.rstrip("/")
 
 
 def _post(endpoint: str, payload: dict):
-    """Send a POST request using the shared session."""
-    resp = _SESSION.post(f"{BASE_URL}{endpoint}", json=payload, timeout=10)
+    """Send a POST request using the calling thread's session.
+
+    The round trip is added to the current session's metrics, if any.
+    """
+    start = time.perf_counter()
+    resp = _session().post(f"{BASE_URL}{endpoint}", json=payload, timeout=10)
+    record_rtt(endpoint, time.perf_counter() - start)
     resp.raise_for_status()
     return resp
 
@@ -0,0 +1,230 @@
+"""Opening books with precomputed moves for the first turns of a game.
+
+Every session on a map starts from the same spawn positions, so a model
+makes the same early decisions every time.  :func:`build_book` plays the
+first turns of a map with the local rules engine against every possible
+enemy step and records the model's move for each state it meets.  Books are
+stored per map layout in ``.kyberna_cache/openings/``, and
+:meth:`~kyberna_ctf.ai.AIBase.decide` consults them before the model
+searches::
+
+    python -m kyberna_ctf.openings --models DijkstraAI,RatioAI --turns 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .distances import map_fingerprint
+from .hexmap import CompiledMap, compile_map
+from .maps import TEAMS, LocalMap, default_maps, load_maps
+from .rules import Match, other_team
+from .state import GameState
+
+OPENINGS_DIR = Path(".kyberna_cache") / "openings"
+# Number of turns covered by a book unless requested otherwise.
+DEFAULT_BOOK_TURNS = 4
+
+# Books already read in this process keyed by map fingerprint; ``None``
+# records that a map has no book.
+_LOADED: Dict[str, Optional["OpeningBook"]] = {}
+
+
+def _key(state: GameState) -> str:
+    player, enemy, flags, enemy_flags, score, enemy_score = state.key()
+    return (
+        f"{player},{enemy},{'.'.join(map(str, flags))},"
+        f"{'.'.join(map(str, enemy_flags))},{score},{enemy_score}"
+    )
+
+
+class OpeningBook:
+    """Moves per model and team keyed by game state for one map layout."""
+
+    __slots__ = ("map_name", "fingerprint", "turns", "lines")
+
+    def __init__(
+        self,
+        map_name: str,
+        fingerprint: str,
+        turns: int,
+        lines: Dict[str, Dict[str, int]] | None = None,
+    ) -> None:
+        self.map_name = map_name
+        self.fingerprint = fingerprint
+        self.turns = turns
+        # "<model>/<team>" -> state key -> direction
+        self.lines = lines if lines is not None else {}
+
+    def lookup(self, model: str, team: str | None, state: GameState) -> Optional[int]:
+        """Return the book move of ``model`` playing ``team`` in ``state``."""
+        line = self.lines.get(f"{model}/{team}")
+        if line is None:
+            return None
+        return line.get(_key(state))
+
+    def to_json(self) -> Dict:
+        return {
+            "map": self.map_name,
+            "fingerprint": self.fingerprint,
+            "turns": self.turns,
+            "lines": self.lines,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "OpeningBook":
+        return cls(data["map"], data["fingerprint"], data["turns"], data["lines"])
+
+
+def book_path(cmap: CompiledMap, directory: Path | None = None) -> Path:
+    return (directory or OPENINGS_DIR) / f"{map_fingerprint(cmap)}.json"
+
+
+def save_book(book: OpeningBook, directory: Path | None = None) -> Path:
+    """Write ``book`` atomically and return its path."""
+    path = (directory or OPENINGS_DIR) / f"{book.fingerprint}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique name per writer, as threads of one process may save at once.
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, prefix=path.name, suffix=".tmp", delete=False
+    ) as f:
+        json.dump(book.to_json(), f)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
+    _LOADED[book.fingerprint] = book
+    return path
+
+
+def load_book(cmap: CompiledMap, directory: Path | None = None) -> Optional[OpeningBook]:
+    """Return the opening book of ``cmap`` or ``None`` if there is none."""
+    key = map_fingerprint(cmap)
+    if key in _LOADED:
+        return _LOADED[key]
+    book = None
+    try:
+        with book_path(cmap, directory).open("r", encoding="utf-8") as f:
+            book = OpeningBook.from_json(json.load(f))
+    except (OSError, ValueError, KeyError):
+        pass
+    if book is not None and book.fingerprint != key:
+        book = None
+    _LOADED[key] = book
+    return book
+
+
+# ----------------------------------------------------------------------
+# Building
+# ----------------------------------------------------------------------
+def _explore(match: Match, ai, team: str, turns: int, line: Dict[str, int], clashes: set) -> None:
+    cmap = match.cmap
+    score = match.score()
+    state = GameState.from_entities(match.entities(), team, cmap.width, score)
+    key = _key(state)
+    move = int(ai.choose_move(cmap, state, score))
+    if line.setdefault(key, move) != move:
+        clashes.add(key)
+    if turns <= 1:
+        return
+    enemy = other_team(team)
+    # Staying in place plus one step per distinct neighbour of the enemy.
+    replies = [None] + [d for d, _ in cmap.adjacency[match.players[enemy]]]
+    for reply in replies:
+        child = match.copy()
+        child.step({team: move, enemy: reply})
+        _explore(child, ai.fork(), team, turns - 1, line, clashes)
+
+
+def build_book(
+    local_map: LocalMap,
+    models: Iterable[str],
+    turns: int = DEFAULT_BOOK_TURNS,
+) -> OpeningBook:
+    """Compute the opening book of ``models`` (``ALL_MODELS`` names) on ``local_map``.
+
+    States that a model answered differently depending on how they were
+    reached are left out of the book.
+    """
+    from .models import ALL_MODELS
+
+    cmap = compile_map(local_map.game_map)
+    book = OpeningBook(local_map.name, map_fingerprint(cmap), turns)
+    root = Match(local_map, turns, cmap)
+    for name in models:
+        for team in TEAMS:
+            line: Dict[str, int] = {}
+            clashes: set = set()
+            _explore(root.copy(), ALL_MODELS[name](team_color=team), team, turns, line, clashes)
+            for key in clashes:
+                del line[key]
+            book.lines[f"{name}/{team}"] = line
+    return book
+
+
+def fetch_map(player_id: str, map_name: str) -> LocalMap:
+    """Read a map and its spawn positions from the game server.
+
+    This opens a ``Manual`` session on ``map_name`` and leaves it waiting.
+    """
+    from . import network
+
+    session_id, _ = network.create_session(player_id, map_name, session_type="Manual")
+    game_map = network.get_map(player_id, session_id)
+    entities = network.get_entities(player_id, session_id)
+    return LocalMap(map_name, game_map, entities)
+
+
+def main() -> None:
+    from .models import ALL_MODELS
+
+    parser = argparse.ArgumentParser(description="Build opening books")
+    parser.add_argument(
+        "--models",
+        default=",".join(n for n, cls in ALL_MODELS.items() if cls.deterministic),
+        help="Comma separated list of AI models (default: all deterministic ones)",
+    )
+    parser.add_argument("--maps", help="Comma separated list of maps (default: all)")
+    parser.add_argument("--map-dir", help="Directory with LocalMap JSON files")
+    parser.add_argument(
+        "--player-id",
+        help="Read the maps from the game server with this player ID instead",
+    )
+    parser.add_argument("--turns", type=int, default=DEFAULT_BOOK_TURNS)
+    args = parser.parse_args()
+
+    models = [n.strip() for n in args.models.split(",") if n.strip()]
+    for name in models:
+        if name not in ALL_MODELS:
+            raise SystemExit(f"Unknown AI model: {name}")
+    names: List[str] | None = (
+        [n.strip() for n in args.maps.split(",") if n.strip()] if args.maps else None
+    )
+    if args.player_id:
+        from . import network
+
+        names = names or network.get_maps(args.player_id)
+        maps = {name: fetch_map(args.player_id, name) for name in names}
+    else:
+        available = load_maps(Path(args.map_dir)) if args.map_dir else default_maps()
+        names = names or list(available)
+        missing = [n for n in names if n not in available]
+        if missing:
+            raise SystemExit(f"Unknown map: {', '.join(missing)}")
+        maps = {name: available[name] for name in names}
+
+    for name, local_map in maps.items():
+        book = build_book(local_map, models, args.turns)
+        path = save_book(book)
+        states = sum(len(line) for line in book.lines.values())
+        print(f"{name}: {states} positions over {args.turns} turns -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Incremental path planning with D* Lite.
+
+Between two turns the player moves a single hex and the dynamic cost fields
+of ``RatioAI`` only change around the enemy, while the goal (a flag or a
+base) usually stays put.  :class:`IncrementalPlanner` keeps its search tree,
+rooted at the goal, between calls and only repairs the part affected by the
+new start position and by cells whose cost changed.  A different goal or a
+change touching a large part of the map restarts the search from scratch.
+
+Costs are per cell: entering cell ``i`` costs ``cell_cost[i]``.  Costs below
+:data:`MIN_STEP_COST` are raised to it so the search stays well defined.  The
+hex-distance heuristic is scaled down to the cheapest step so it stays
+consistent; the goal is excluded since it is the root of the search tree and
+never re-expanded.
+"""
+
+from __future__ import annotations
+
+from heapq import heappop, heappush
+from typing import Dict, List, Optional, Sequence
+
+from .hexmap import CompiledMap
+
+INF = float("inf")
+
+# Smallest cost of entering a cell.
+MIN_STEP_COST = 0.05
+# Fraction of the map whose cost may change before the tree is rebuilt.
+RESET_FRACTION = 0.25
+
+
+class IncrementalPlanner:
+    """D* Lite search from ``start`` to a fixed ``goal`` on a compiled map."""
+
+    def __init__(self, cmap: CompiledMap) -> None:
+        self.cmap = cmap
+        self.start = -1
+        self.goal = -1
+        self.expanded = 0
+        self._cost: List[float] = []
+        self._g: List[float] = []
+        self._rhs: List[float] = []
+        self._heap: list = []
+        self._open: Dict[int, tuple] = {}
+        self._km = 0.0
+        self._h_scale = 1.0
+        self._last_start = -1
+        self._unit = False
+
+    # ------------------------------------------------------------------
+    # D* Lite internals
+    # ------------------------------------------------------------------
+    def _h(self, a: int, b: int) -> float:
+        aq = self.cmap.axial_q
+        ar = self.cmap.axial_r
+        dq = aq[a] - aq[b]
+        dr = ar[a] - ar[b]
+        return ((abs(dq) + abs(dr) + abs(dq + dr)) >> 1) * self._h_scale
+
+    def _key(self, cell: int) -> tuple:
+        m = min(self._g[cell], self._rhs[cell])
+        return (m + self._h(self.start, cell) + self._km, m)
+
+    def _update(self, cell: int) -> None:
+        g = self._g
+        rhs = self._rhs
+        if cell != self.goal:
+            cost = self._cost
+            best = INF
+            for _, nxt in self.cmap.adjacency[cell]:
+                value = cost[nxt] + g[nxt]
+                if value < best:
+                    best = value
+            rhs[cell] = best
+        if g[cell] != rhs[cell]:
+            key = self._key(cell)
+            self._open[cell] = key
+            heappush(self._heap, (key, cell))
+        else:
+            self._open.pop(cell, None)
+
+    def _compute(self) -> None:
+        heap = self._heap
+        open_keys = self._open
+        g = self._g
+        rhs = self._rhs
+        adjacency = self.cmap.adjacency
+        start = self.start
+        while heap:
+            k_old, cell = heap[0]
+            if open_keys.get(cell) != k_old:
+                heappop(heap)
+                continue
+            if k_old >= self._key(start) and rhs[start] == g[start]:
+                break
+            heappop(heap)
+            del open_keys[cell]
+            self.expanded += 1
+            k_new = self._key(cell)
+            if k_old < k_new:
+                open_keys[cell] = k_new
+                heappush(heap, (k_new, cell))
+            elif g[cell] > rhs[cell]:
+                g[cell] = rhs[cell]
+                for _, pred in adjacency[cell]:
+                    self._update(pred)
+            else:
+                g[cell] = INF
+                self._update(cell)
+                for _, pred in adjacency[cell]:
+                    self._update(pred)
+
+    @staticmethod
+    def _min_step(cost: List[float], goal: int) -> float:
+        goal_cost = cost[goal]
+        cost[goal] = 1.0
+        lowest = min(cost)
+        cost[goal] = goal_cost
+        return min(1.0, lowest)
+
+    def _reset(self, start: int, goal: int, cost: List[float]) -> None:
+        size = self.cmap.size
+        self.start = start
+        self.goal = goal
+        self._last_start = start
+        self._cost = cost
+        self._h_scale = self._min_step(cost, goal)
+        self._g = [INF] * size
+        self._rhs = [INF] * size
+        self._rhs[goal] = 0.0
+        self._km = 0.0
+        self._heap = []
+        self._open = {}
+        key = self._key(goal)
+        self._open[goal] = key
+        self._heap.append((key, goal))
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def plan(self, start: int, goal: int, cell_cost: Sequence[float] | None = None) -> bool:
+        """Update the plan for ``start`` -> ``goal`` and return reachability.
+
+        ``cell_cost`` defaults to a uniform cost of one per step.
+        """
+        if cell_cost is None:
+            cost = self._cost if self._unit and self._cost else [1.0] * self.cmap.size
+        else:
+            cost = [c if c > MIN_STEP_COST else MIN_STEP_COST for c in cell_cost]
+
+        if goal != self.goal or not self._g:
+            self._reset(start, goal, cost)
+        else:
+            if cost is self._cost:
+                changed = []
+            else:
+                old = self._cost
+                changed = [i for i, (a, b) in enumerate(zip(old, cost)) if a != b]
+            if len(changed) > RESET_FRACTION * self.cmap.size or (
+                changed and self._min_step(cost, goal) < self._h_scale
+            ):
+                self._reset(start, goal, cost)
+            else:
+                if start != self._last_start:
+                    self.start = start
+                    self._km += self._h(self._last_start, start)
+                    self._last_start = start
+                if changed:
+                    self._cost = cost
+                    adjacency = self.cmap.adjacency
+                    for cell in changed:
+                        for _, pred in adjacency[cell]:
+                            self._update(pred)
+        self._unit = cell_cost is None
+        self._compute()
+        return self._rhs[start] < INF
+
+    def cost(self) -> Optional[float]:
+        """Return the cost of the current plan or ``None`` if unreachable."""
+        value = self._rhs[self.start]
+        return value if value < INF else None
+
+    def _next(self, cell: int) -> Optional[tuple]:
+        best = None
+        best_value = INF
+        g = self._g
+        cost = self._cost
+        for direction, nxt in self.cmap.adjacency[cell]:
+            value = cost[nxt] + g[nxt]
+            if value < best_value:
+                best_value = value
+                best = (direction, nxt)
+        return best
+
+    def first_move(self) -> Optional[int]:
+        """Return the first direction of the current plan."""
+        if self.start == self.goal or self.cost() is None:
+            return None
+        step = self._next(self.start)
+        return step[0] if step is not None else None
+
+    def path_cells(self) -> Optional[List[int]]:
+        """Return the cells of the current plan from start to goal inclusive."""
+        if self.cost() is None:
+            return None
+        cells = [self.start]
+        cell = self.start
+        while cell != self.goal and len(cells) <= self.cmap.size:
+            step = self._next(cell)
+            if step is None:
+                return None
+            cell = step[1]
+            cells.append(cell)
+        return cells if cell == self.goal else None
+
+    def path(self) -> Optional[List[int]]:
+        """Return the directions of the current plan."""
+        cells = self.path_cells()
+        if cells is None:
+            return None
+        result = []
+        for cell, nxt in zip(cells, cells[1:]):
+            for direction, j in self.cmap.adjacency[cell]:
+                if j == nxt:
+                    result.append(direction)
+                    break
+        return result
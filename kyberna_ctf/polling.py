@@ -0,0 +1,157 @@
+"""Adaptive polling of the game state.
+
+After our move is sent the session loops sleep before the first poll.  Once
+a few opponent response times have been observed that first poll is delayed
+to just before the typical response time and the following ones come at a
+fraction of it, backing off while the wait drags on.  Until then the
+interval starts at the minimum and backs off.  Only the latest response
+times count, so the polling follows an opponent that speeds up or slows
+down.
+
+A response time is measured up to the poll that saw it, not up to its
+answer, so our own round trips do not inflate it.  The answer came at some
+point since the previous poll (or since our move), so the middle of that
+gap is taken as its time.  The first poll after a move therefore records
+half its sleep, and an estimate that was too long shrinks from turn to turn
+instead of confirming itself.  The observed latencies
+are kept for reporting and, given a :class:`~kyberna_ctf.metrics.Metrics`,
+recorded per turn together with the number of polls the turn took.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Optional
+
+from .metrics import Metrics
+
+# Bounds of the polling interval in seconds.
+MIN_POLL_INTERVAL = 0.02
+MAX_POLL_INTERVAL = 0.5
+# Growth factor of the interval for every unsuccessful poll.
+BACKOFF = 1.2
+# Response times observed before they steer the polling, and how many of
+# the latest ones are considered.
+MIN_SAMPLES = 3
+HISTORY = 5
+# Portion of the median response latency slept before the first delayed
+# poll, and the interval of the polls after it as a portion of the median.
+EXPECTED_FRACTION = 0.9
+FOLLOW_UP_FRACTION = 0.1
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class AdaptivePoller:
+    """Decide how long to sleep between state polls.
+
+    ``clock`` returns the current time in seconds, :func:`time.perf_counter`
+    unless given.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = MIN_POLL_INTERVAL,
+        max_interval: float = MAX_POLL_INTERVAL,
+        backoff: float = BACKOFF,
+        metrics: Metrics | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.clock = clock
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.polls = 0
+        self.metrics = metrics
+        self.latencies: List[float] = []
+        self._turn_polls = 0
+        self._interval = min_interval
+        self._sent_at: Optional[float] = None
+        # When the latest poll was sent, and how much earlier the opponent
+        # probably answered if that poll is the first to see the answer.
+        self._polled_at = 0.0
+        self._slack = 0.0
+        self._first_wait = True
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def move_sent(self) -> None:
+        """Record that our move was sent and the opponent is expected."""
+        self._sent_at = self._polled_at = self.clock()
+        self._slack = 0.0
+        self._interval = self.min_interval
+        self._first_wait = True
+
+    def ready(self) -> None:
+        """Record that it is our turn again."""
+        if self._sent_at is not None:
+            latency = max(0.0, self._polled_at - self._slack - self._sent_at)
+            self.latencies.append(latency)
+            self._sent_at = None
+            if self.metrics is not None:
+                self.metrics.observe("opponent_time", latency)
+        if self.metrics is not None:
+            self.metrics.observe("polls_per_turn", self.polls - self._turn_polls)
+        self._turn_polls = self.polls
+
+    def expected_latency(self) -> Optional[float]:
+        """Return the median of the latest response times, once enough are known."""
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        return _percentile(sorted(self.latencies[-HISTORY:]), 0.5)
+
+    def next_interval(self) -> float:
+        """Return the time to sleep before the next poll."""
+        self.polls += 1
+        now = self.clock()
+        sent_at = self._sent_at
+        first_wait = self._first_wait and sent_at is not None
+        self._first_wait = False
+        median = self.expected_latency() if first_wait else None
+        if median is not None:
+            self._interval = self._clamp(median * FOLLOW_UP_FRACTION)
+            delay = median * EXPECTED_FRACTION - (now - sent_at)
+            if delay > self._interval:
+                self._polled_at = now + delay
+                # Any time since the move, so only an upper bound.
+                self._slack = (self._polled_at - sent_at) / 2
+                return delay
+        interval = self._interval
+        self._interval = min(self.max_interval, self._interval * self.backoff)
+        self._polled_at = now + interval
+        # An answer seen by the next poll arrived since the previous one, or
+        # since the move if there was none.
+        since = sent_at if first_wait else now
+        self._slack = (self._polled_at - since) / 2
+        return interval
+
+    def wait(self) -> None:
+        time.sleep(self.next_interval())
+
+    def summary(self) -> Dict[str, float]:
+        """Return the poll count and opponent latency distribution."""
+        result: Dict[str, float] = {"polls": self.polls, "responses": len(self.latencies)}
+        if self.latencies:
+            values = sorted(self.latencies)
+            result.update(
+                mean=sum(values) / len(values),
+                p50=_percentile(values, 0.5),
+                p90=_percentile(values, 0.9),
+                p99=_percentile(values, 0.99),
+                max=values[-1],
+            )
+        return result
+
+    def describe(self) -> str:
+        stats = self.summary()
+        text = f"{stats['polls']} polls, {stats['responses']} opponent responses"
+        if "p50" in stats:
+            text += (
+                f", latency p50 {stats['p50'] * 1000:.0f}ms"
+                f" p90 {stats['p90'] * 1000:.0f}ms max {stats['max'] * 1000:.0f}ms"
+            )
+        return text
@@ -0,0 +1,421 @@
+"""Replays of live sessions and offline re-simulation of their positions.
+
+:class:`ReplayWriter` streams every turn of a session into an append-only
+file in :data:`REPLAY_DIR`.  The file starts with a header holding the
+session metadata, the static entities (bases) and the passability grid of
+the map, which is stored only once.  Each turn follows as one fixed-width
+binary record:
+
+* turn number and the CRC-32 of the map layout;
+* both scores;
+* the direction sent, whether it was a fallback move, and the decision
+  time;
+* the cell of every dynamic entity (players and flags), or ``-1`` while it
+  is absent.
+
+The dynamic entities form a fixed roster of slots taken from the first
+turn, which keeps the records the same width.  Entities are matched to
+their slots by id, or by type, team and order where the server sends no id.  Every record is flushed as
+it is written, so a crashed session still leaves a readable replay; a
+truncated last record is ignored.
+
+The replay tool feeds the recorded positions to any ``ALL_MODELS`` entry in
+order and reports its decision times and the turns where it disagrees with
+the recorded move::
+
+    python -m kyberna_ctf.replay replays/<file>.kcr --models DijkstraAI,RatioAI
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, NamedTuple, Tuple
+
+from .hexmap import NO_CELL, CompiledMap, compile_map
+
+# Directory receiving the replay files of played sessions.
+REPLAY_DIR = Path("replays")
+
+_MAGIC = b"KCRP"
+_VERSION = 1
+# magic, version, metadata length, grid length
+_HEADER = struct.Struct("<4sHII")
+# turn, map CRC, red score, blue score, direction, flags, decision seconds;
+# followed by one int32 cell per roster slot.
+_TURN_PREFIX = "<IIhhbBf"
+_FALLBACK = 1
+
+# Entity types whose position is stored in every turn record.
+DYNAMIC_TYPES = ("Player", "Flag")
+
+
+def _turn_struct(slots: int) -> struct.Struct:
+    return struct.Struct(_TURN_PREFIX + "i" * slots)
+
+
+def map_crc(cmap: CompiledMap) -> int:
+    """Return a CRC-32 of the layout of ``cmap``."""
+    return zlib.crc32(cmap.passable, zlib.crc32(f"{cmap.width}x{cmap.height}".encode()))
+
+
+def _entity(kind: str, team: str, entity_id: str, cell: int, width: int) -> Dict:
+    return {
+        "gameEntityId": entity_id,
+        "teamColor": team,
+        "type": kind,
+        "location": {"x": cell % width, "y": cell // width},
+    }
+
+
+def _keyed(entities: List[Dict]) -> Iterator[Tuple[Hashable, Dict]]:
+    """Yield every entity with the key of its roster slot.
+
+    The key is the entity id; entities without one are told apart by type,
+    team and their order among the id-less entities of that type and team.
+    """
+    seen: Dict[Tuple, int] = {}
+    for e in entities:
+        eid = e.get("gameEntityId")
+        if eid is None:
+            kind = (e.get("type"), e.get("teamColor"))
+            ordinal = seen[kind] = seen.get(kind, -1) + 1
+            yield (*kind, ordinal), e
+        else:
+            yield eid, e
+
+
+class ReplayWriter:
+    """Append the turns of one session to a replay file.
+
+    The header is written with the first turn, when the map and the
+    entities are known.
+    """
+
+    def __init__(
+        self,
+        map_name: str,
+        team_color: str,
+        model: str,
+        session_id: str,
+        directory: Path | None = None,
+    ) -> None:
+        self.map_name = map_name
+        self.team_color = team_color
+        self.model = model
+        self.session_id = session_id
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = (directory or REPLAY_DIR) / f"{stamp}-{map_name}-{model}-{session_id}.kcr"
+        self.turns = 0
+        # Dynamic entities seen later that have no slot in the roster.
+        self.dropped = 0
+        self._file = None
+        self._slots: Dict[str, int] = {}
+        self._record: struct.Struct | None = None
+        self._map = None
+        self._crc = 0
+        self._width = 0
+
+    def __enter__(self) -> "ReplayWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _start(self, cmap: CompiledMap, entities: List[Dict]) -> None:
+        static = []
+        roster = []
+        for key, e in _keyed(entities):
+            loc = e["location"]
+            cell = loc["y"] * cmap.width + loc["x"]
+            if e["type"] in DYNAMIC_TYPES:
+                if key in self._slots:
+                    continue
+                self._slots[key] = len(roster)
+                roster.append([e.get("gameEntityId"), e["type"], e["teamColor"]])
+            else:
+                static.append([e.get("gameEntityId"), e["type"], e["teamColor"], cell])
+        meta = {
+            "map": self.map_name,
+            "team": self.team_color,
+            "model": self.model,
+            "session": self.session_id,
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "width": cmap.width,
+            "height": cmap.height,
+            "static": static,
+            "roster": roster,
+        }
+        blob = json.dumps(meta).encode()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("ab")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, len(blob), cmap.size))
+        self._file.write(blob)
+        self._file.write(bytes(cmap.passable))
+        self._file.flush()
+        self._record = _turn_struct(len(roster))
+
+    def record(
+        self,
+        game_map: Dict | CompiledMap,
+        entities: List[Dict],
+        score: Dict | None,
+        direction: int,
+        duration: float,
+        fallback: bool = False,
+    ) -> None:
+        """Append one turn: the position we decided on and our answer."""
+        if game_map is not self._map:
+            cmap = compile_map(game_map)
+            self._map = game_map
+            self._crc = map_crc(cmap)
+            self._width = cmap.width
+            if self._file is None:
+                self._start(cmap, entities)
+        cells = [NO_CELL] * len(self._slots)
+        width = self._width
+        for key, e in _keyed(entities):
+            slot = self._slots.get(key)
+            if slot is None:
+                if e.get("type") in DYNAMIC_TYPES:
+                    self.dropped += 1
+                continue
+            try:
+                loc = e["location"]
+                cells[slot] = loc["y"] * width + loc["x"]
+            except (KeyError, TypeError):
+                # A malformed entity must not end a live session.
+                self.dropped += 1
+        score = score if isinstance(score, dict) else {}
+        self._file.write(
+            self._record.pack(
+                self.turns,
+                self._crc,
+                score.get("Red", 0),
+                score.get("Blue", 0),
+                direction,
+                _FALLBACK if fallback else 0,
+                duration,
+                *cells,
+            )
+        )
+        self._file.flush()
+        self.turns += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ReplayTurn(NamedTuple):
+    turn: int
+    map_crc: int
+    score: Dict[str, int]
+    direction: int
+    fallback: bool
+    duration: float
+    entities: List[Dict]
+
+
+class Replay:
+    """A replay file read back into memory."""
+
+    def __init__(self, meta: Dict, cmap: CompiledMap, turns: List[ReplayTurn]) -> None:
+        self.meta = meta
+        self.cmap = cmap
+        self.turns = turns
+
+    @property
+    def team_color(self) -> str:
+        return self.meta["team"]
+
+    @property
+    def model(self) -> str:
+        return self.meta["model"]
+
+
+def load_replay(path: Path) -> Replay:
+    """Read a file written by :class:`ReplayWriter`."""
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is not a replay file.")
+    magic, version, meta_len, grid_len = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"{path} is not a replay file of version {_VERSION}.")
+    offset = _HEADER.size
+    meta = json.loads(data[offset : offset + meta_len])
+    offset += meta_len
+    cmap = CompiledMap(meta["width"], meta["height"], data[offset : offset + grid_len])
+    offset += grid_len
+
+    width = cmap.width
+    static = [_entity(kind, team, eid, cell, width) for eid, kind, team, cell in meta["static"]]
+    roster = meta["roster"]
+    record = _turn_struct(len(roster))
+    turns = []
+    # A partial record at the end is a turn that was being written.
+    end = offset + (len(data) - offset) // record.size * record.size
+    for values in record.iter_unpack(data[offset:end]):
+        turn, crc, red, blue, direction, flags, duration, *cells = values
+        entities = list(static)
+        for (eid, kind, team), cell in zip(roster, cells):
+            if cell != NO_CELL:
+                entities.append(_entity(kind, team, eid, cell, width))
+        turns.append(
+            ReplayTurn(
+                turn,
+                crc,
+                {"Red": red, "Blue": blue},
+                direction,
+                bool(flags & _FALLBACK),
+                duration,
+                entities,
+            )
+        )
+    return Replay(meta, cmap, turns)
+
+
+# ----------------------------------------------------------------------
+# Re-simulation
+# ----------------------------------------------------------------------
+class ReplayResult(NamedTuple):
+    model: str
+    durations: List[float]
+    directions: List[int]
+    # Turns where the model chose a different move than was sent, not
+    # counting turns where a fallback move was sent.
+    diverged: List[int]
+
+
+def replay_model(replay: Replay, model: str, deadline: float | None = None) -> ReplayResult:
+    """Feed every recorded position of ``replay`` to a fresh ``model`` in order.
+
+    ``deadline`` is the per-move budget in seconds passed on as a soft
+    deadline, like in a live session.
+    """
+    from .models import ALL_MODELS
+
+    ai = ALL_MODELS[model](team_color=replay.team_color)
+    cmap = replay.cmap
+    durations = []
+    directions = []
+    diverged = []
+    try:
+        for turn in replay.turns:
+            start = time.perf_counter()
+            limit = None if deadline is None else start + deadline
+            direction = int(ai.decide(cmap, turn.entities, turn.score, limit))
+            durations.append(time.perf_counter() - start)
+            directions.append(direction)
+            if direction != turn.direction and not turn.fallback:
+                diverged.append(turn.turn)
+    finally:
+        ai.close()
+    return ReplayResult(model, durations, directions, diverged)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def describe_result(result: ReplayResult) -> str:
+    times = result.durations
+    mean = sum(times) / len(times) if times else 0.0
+    return (
+        f"{result.model:<16} {len(times):>6} {mean * 1000:>8.2f} "
+        f"{_percentile(times, 0.95) * 1000:>8.2f} {max(times, default=0.0) * 1000:>8.2f} "
+        f"{len(result.diverged):>9}"
+    )
+
+
+def main() -> None:
+    from .models import ALL_MODELS
+
+    parser = argparse.ArgumentParser(description="Re-run recorded positions through AI models")
+    parser.add_argument("replay", help="Replay file written during a session")
+    parser.add_argument(
+        "--models",
+        help="Comma separated list of AI models (default: the recorded one)",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="Soft deadline in seconds passed to the models per move",
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        default=5,
+        help="Number of slowest turns to list per model",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a cProfile summary of each model's run",
+    )
+    args = parser.parse_args()
+
+    try:
+        replay = load_replay(Path(args.replay))
+    except (OSError, ValueError) as exc:
+        raise SystemExit(str(exc))
+    models = (
+        [n.strip() for n in args.models.split(",") if n.strip()]
+        if args.models
+        else [replay.model]
+    )
+    for name in models:
+        if name not in ALL_MODELS:
+            raise SystemExit(f"Unknown AI model: {name}")
+
+    meta = replay.meta
+    print(
+        f"{meta['map']} as {meta['team']} by {meta['model']} "
+        f"(session {meta['session']}, {meta['started']}): {len(replay.turns)} turns"
+    )
+    crc = map_crc(replay.cmap)
+    changed = [t.turn for t in replay.turns if t.map_crc != crc]
+    if changed:
+        print(f"Warning: the map changed on turns {changed}; the stored map is used.")
+    recorded = [t.duration for t in replay.turns]
+    if recorded:
+        print(
+            f"Recorded decision time: mean {sum(recorded) / len(recorded) * 1000:.2f}ms, "
+            f"max {max(recorded) * 1000:.2f}ms, "
+            f"{sum(t.fallback for t in replay.turns)} fallback moves"
+        )
+
+    results = []
+    for name in models:
+        if args.profile:
+            import cProfile
+            import pstats
+
+            profiler = cProfile.Profile()
+            result = profiler.runcall(replay_model, replay, name, args.budget)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+        else:
+            result = replay_model(replay, name, args.budget)
+        results.append(result)
+
+    print(f"{'Model':<16} {'Turns':>6} {'mean ms':>8} {'p95 ms':>8} {'max ms':>8} {'diverged':>9}")
+    for result in results:
+        print(describe_result(result))
+    for result in results:
+        slowest = sorted(
+            zip(result.durations, (t.turn for t in replay.turns)), reverse=True
+        )[: args.slowest]
+        if slowest:
+            turns = ", ".join(f"{turn} ({d * 1000:.1f}ms)" for d, turn in slowest)
+            print(f"{result.model} slowest turns: {turns}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Game results stored in SQLite.
+
+Every finished game becomes one row per participating model in
+:data:`RESULTS_DB`: model, opponent, map, team, both scores, the number of
+turns and the time spent deciding.  Live sessions and simulated tournament
+games go to the same table, told apart by ``source``.
+
+Rows are not written by the game threads themselves.  A :class:`ResultStore`
+queues them for a single writer thread, which commits them in batches.  The
+database runs in WAL mode, so queries can read while games are being
+written.  :func:`model_stats` aggregates the table per model and map in SQL::
+
+    python -m kyberna_ctf.results --model RatioAI --by-map
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, NamedTuple
+
+# Database receiving the results of all games.
+RESULTS_DB = Path("results.db")
+
+# Rows committed together, and the longest a row waits for a full batch.
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+# Seconds a connection waits for a lock held by another process.
+BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    played TEXT NOT NULL,
+    source TEXT NOT NULL,
+    session TEXT,
+    model TEXT NOT NULL,
+    opponent TEXT,
+    map TEXT NOT NULL,
+    team TEXT NOT NULL,
+    score INTEGER,
+    opponent_score INTEGER,
+    turns INTEGER,
+    think_time REAL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS results_model_map ON results (model, map);
+"""
+
+_COLUMNS = (
+    "played",
+    "source",
+    "session",
+    "model",
+    "opponent",
+    "map",
+    "team",
+    "score",
+    "opponent_score",
+    "turns",
+    "think_time",
+    "duration",
+)
+_INSERT = (
+    f"INSERT INTO results ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+)
+
+
+class GameResult(NamedTuple):
+    """One game seen from one model's side.
+
+    Scores are ``None`` when the server answered with something other than
+    a score.  ``think_time`` is the total decision time in seconds and
+    ``duration`` the wall-clock time of the session.
+    """
+
+    played: str
+    source: str
+    session: str | None
+    model: str
+    opponent: str | None
+    map: str
+    team: str
+    score: int | None
+    opponent_score: int | None
+    turns: int | None
+    think_time: float | None
+    duration: float | None
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def session_result(
+    model: str,
+    map_name: str,
+    team: str,
+    session_id: str,
+    score,
+    turns: int,
+    think_time: float,
+    duration: float,
+) -> GameResult:
+    """Build the row of a finished server session from its raw score reply."""
+    mine = theirs = None
+    if isinstance(score, dict) and "Red" in score and "Blue" in score:
+        mine = score[team]
+        theirs = score["Blue" if team == "Red" else "Red"]
+    return GameResult(
+        played=_now(),
+        source="live",
+        session=session_id,
+        model=model,
+        opponent=None,
+        map=map_name,
+        team=team,
+        score=mine,
+        opponent_score=theirs,
+        turns=turns,
+        think_time=think_time,
+        duration=duration,
+    )
+
+
+def simulated_results(game: dict) -> List[GameResult]:
+    """Return both sides of a :func:`~kyberna_ctf.server.simulate_game` result."""
+    played = _now()
+    return [
+        GameResult(
+            played=played,
+            source="simulated",
+            session=None,
+            model=game[team.lower()],
+            opponent=game[opp.lower()],
+            map=game["map"],
+            team=team,
+            score=game["score"][team],
+            opponent_score=game["score"][opp],
+            turns=game["turns"],
+            think_time=game["think_time"][team],
+            duration=None,
+        )
+        for team, opp in (("Red", "Blue"), ("Blue", "Red"))
+    ]
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode a commit survives an application crash without a sync.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class ResultStore:
+    """Buffered writer of :class:`GameResult` rows.
+
+    :meth:`record` only queues the row; a background thread commits queued
+    rows in batches of up to ``batch_size``, waiting at most
+    ``flush_interval`` seconds for a batch to fill.  Use it as a context
+    manager or call :meth:`close` to write the remaining rows.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+    ) -> None:
+        self.path = path or RESULTS_DB
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Opened here so that errors surface to the caller; only the writer
+        # thread uses it afterwards.
+        self._conn = _connect(self.path)
+        self._queue: "queue.Queue[GameResult | threading.Event | None]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(self, result: GameResult) -> None:
+        self._queue.put(result)
+
+    def record_many(self, results: Iterable[GameResult]) -> None:
+        for result in results:
+            self._queue.put(result)
+
+    def flush(self) -> None:
+        """Block until every row queued so far is committed."""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._conn.close()
+
+    def _run(self) -> None:
+        get = self._queue.get
+        while True:
+            items = [get()]
+            deadline = time.monotonic() + self.flush_interval
+            # A flush or close request ends the batch early.
+            while len(items) < self.batch_size and isinstance(items[-1], GameResult):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(get(timeout=timeout))
+                except queue.Empty:
+                    break
+            rows = [item for item in items if isinstance(item, GameResult)]
+            if rows:
+                try:
+                    with self._conn:
+                        self._conn.executemany(_INSERT, rows)
+                    self.written += len(rows)
+                except sqlite3.Error as exc:
+                    print(f"Failed to store {len(rows)} game results: {exc}")
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if items[-1] is None:
+                return
+
+
+# Process-wide store used by the session loops, opened on first use.
+_STORE: ResultStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def record_result(result: GameResult) -> None:
+    """Queue ``result`` on the process-wide :class:`ResultStore`."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = ResultStore()
+            atexit.register(_STORE.close)
+    _STORE.record(result)
+
+
+# ----------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------
+class ModelStats(NamedTuple):
+    model: str
+    map: str | None
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    # Mean of the (smoothed) score ratios, as in the tournament standings.
+    ratio: float
+    turns: int
+    think_time: float
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def ms_per_turn(self) -> float:
+        return self.think_time / self.turns * 1000 if self.turns else 0.0
+
+
+def model_stats(
+    path: Path | None = None,
+    model: str | None = None,
+    map_name: str | None = None,
+    source: str | None = None,
+    by_map: bool = False,
+) -> List[ModelStats]:
+    """Aggregate the stored games per model, and per map with ``by_map``.
+
+    Games without a score are left out.
+    """
+    conditions = ["score IS NOT NULL"]
+    params = []
+    for column, value in (("model", model), ("map", map_name), ("source", source)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    group = "model, map" if by_map else "model"
+    query = f"""
+        SELECT model, {"map" if by_map else "NULL"}, COUNT(*),
+               SUM(score > opponent_score), SUM(score = opponent_score),
+               SUM(score < opponent_score),
+               AVG((score + 1.0) / (opponent_score + 1)),
+               COALESCE(SUM(turns), 0), COALESCE(SUM(think_time), 0.0)
+        FROM results WHERE {" AND ".join(conditions)}
+        GROUP BY {group} ORDER BY {group}
+    """
+    conn = _connect(path or RESULTS_DB)
+    try:
+        return [ModelStats(*row) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
+
+
+def win_rate(model: str, map_name: str | None = None, path: Path | None = None) -> float:
+    """Return the share of stored games ``model`` won, optionally on one map."""
+    stats = model_stats(path, model, map_name)
+    return stats[0].win_rate if stats else 0.0
+
+
+# Lines written to ``scores.log`` by earlier versions.
+_LOG_LINE = re.compile(
+    r"^(?P<played>[\d-]+ [\d:]+) \| Map: (?P<map>.*?) \| Team: (?P<team>\w+) \| "
+    r"Red: (?P<red>\d+), Blue: (?P<blue>\d+)$"
+)
+
+
+def import_score_log(log: Path, store: ResultStore) -> int:
+    """Queue the games of an old ``scores.log`` file; return their number.
+
+    The log did not name the model, so it is stored as ``"unknown"``.
+    """
+    count = 0
+    with log.open(encoding="utf-8") as f:
+        for line in f:
+            match = _LOG_LINE.match(line.strip())
+            if match is None:
+                continue
+            team = match["team"]
+            score = {"Red": int(match["red"]), "Blue": int(match["blue"])}
+            result = session_result("unknown", match["map"], team, None, score, None, None, None)
+            store.record(result._replace(played=match["played"].replace(" ", "T")))
+            count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarise stored game results")
+    parser.add_argument("--db", type=Path, default=RESULTS_DB, help="Results database")
+    parser.add_argument("--model", help="Only include this model")
+    parser.add_argument("--map", help="Only include games on this map")
+    parser.add_argument("--source", choices=("live", "simulated"), help="Only include these games")
+    parser.add_argument("--by-map", action="store_true", help="One row per model and map")
+    parser.add_argument("--import-log", type=Path, help="Import an old scores.log first")
+    args = parser.parse_args()
+
+    try:
+        if args.import_log:
+            with ResultStore(args.db) as store:
+                count = import_score_log(args.import_log, store)
+            print(f"Imported {count} games from {args.import_log}")
+        stats = model_stats(args.db, args.model, args.map, args.source, args.by_map)
+    except (OSError, sqlite3.Error) as exc:
+        raise SystemExit(str(exc))
+    if not stats:
+        raise SystemExit("No matching games.")
+    print(
+        f"{'Model':<16} {'Map':<12} {'Games':>6} {'Win%':>6} {'Draw%':>6} "
+        f"{'Ratio':>6} {'ms/turn':>8}"
+    )
+    for row in stats:
+        n = row.games
+        print(
+            f"{row.model:<16} {row.map or 'all':<12} {n:>6} {row.win_rate:>6.1%} "
+            f"{row.draws / n:>6.1%} {row.ratio:>6.2f} {row.ms_per_turn:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Capture-the-flag rules used for offline simulation.
+
+The rules mirror what the clients observe from the real server:
+
+* Both players submit a direction each turn and the moves are resolved
+  simultaneously.  Moving into a wall or off the map leaves the player in
+  place.
+* Stepping onto the enemy flag picks it up; the flag disappears from the
+  entity list while it is carried.
+* Reaching one of the own bases while carrying the flag scores a point and
+  the flag respawns at its starting cell.
+* A player meeting the enemy carrier of its own flag (same cell or swapping
+  cells) sends that flag back to its starting cell.
+* The game ends after ``max_turns`` turns.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List
+
+from .hexmap import NO_CELL, CompiledMap, compile_map
+from .maps import TEAMS, LocalMap
+
+# Number of turns before a game is over.
+DEFAULT_MAX_TURNS = 200
+
+
+def other_team(team: str) -> str:
+    return "Blue" if team == "Red" else "Red"
+
+
+class Match:
+    """State of a single game between the red and blue team."""
+
+    def __init__(
+        self,
+        local_map: LocalMap,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        cmap: CompiledMap | None = None,
+    ) -> None:
+        self.map_name = local_map.name
+        self.game_map = local_map.game_map
+        self.cmap = cmap or compile_map(local_map.game_map)
+        self.max_turns = max_turns
+        self.turn = 0
+
+        w = self.cmap.width
+        self.players: Dict[str, int] = {}
+        self.bases: Dict[str, List[int]] = {team: [] for team in TEAMS}
+        self.flag_spawn: Dict[str, int] = {}
+        for e in local_map.entities:
+            cell = e["location"]["y"] * w + e["location"]["x"]
+            team = e["teamColor"]
+            if e["type"] == "Player":
+                self.players[team] = cell
+            elif e["type"] == "Base":
+                self.bases[team].append(cell)
+            elif e["type"] == "Flag":
+                self.flag_spawn[team] = cell
+        missing = [t for t in TEAMS if t not in self.players or t not in self.flag_spawn]
+        if missing or not all(self.bases.values()):
+            raise ValueError(f"Map {self.map_name} lacks entities for a full game.")
+
+        # Cell of every team's flag, NO_CELL while it is carried.
+        self.flags: Dict[str, int] = dict(self.flag_spawn)
+        # Whether a team's player is carrying the enemy flag.
+        self.carrying: Dict[str, bool] = {team: False for team in TEAMS}
+        self.scores: Dict[str, int] = {team: 0 for team in TEAMS}
+
+    def copy(self) -> "Match":
+        """Return an independent copy sharing the map and its layout data."""
+        clone = Match.__new__(Match)
+        clone.__dict__.update(self.__dict__)
+        clone.players = dict(self.players)
+        clone.flags = dict(self.flags)
+        clone.carrying = dict(self.carrying)
+        clone.scores = dict(self.scores)
+        return clone
+
+    @property
+    def over(self) -> bool:
+        return self.turn >= self.max_turns
+
+    def score(self) -> Dict[str, int]:
+        return dict(self.scores)
+
+    def entities(self) -> List[Dict]:
+        """Return the entity list in the shape served by ``/Game/Entities``."""
+        w = self.cmap.width
+        result = []
+
+        def add(kind: str, team: str, cell: int, suffix: str = "") -> None:
+            result.append(
+                {
+                    "gameEntityId": f"{team}-{kind}{suffix}",
+                    "teamColor": team,
+                    "type": kind,
+                    "location": {"x": cell % w, "y": cell // w},
+                }
+            )
+
+        for team in TEAMS:
+            add("Player", team, self.players[team])
+            for n, base in enumerate(self.bases[team]):
+                add("Base", team, base, f"-{n}" if n else "")
+            if self.flags[team] != NO_CELL:
+                add("Flag", team, self.flags[team])
+        return result
+
+    def step(self, moves: Dict[str, int]) -> None:
+        """Resolve one turn given each team's direction (1-6)."""
+        if self.over:
+            return
+        before = dict(self.players)
+        cmap = self.cmap
+        for team in TEAMS:
+            direction = moves.get(team)
+            if direction is None:
+                continue
+            nxt = cmap.neighbor(before[team], direction)
+            if nxt != NO_CELL:
+                self.players[team] = nxt
+
+        red, blue = TEAMS
+        met = self.players[red] == self.players[blue] or (
+            self.players[red] == before[blue] and self.players[blue] == before[red]
+        )
+        if met:
+            for team in TEAMS:
+                if self.carrying[team]:
+                    enemy = other_team(team)
+                    self.carrying[team] = False
+                    self.flags[enemy] = self.flag_spawn[enemy]
+
+        for team in TEAMS:
+            enemy = other_team(team)
+            pos = self.players[team]
+            if not self.carrying[team] and self.flags[enemy] == pos:
+                self.carrying[team] = True
+                self.flags[enemy] = NO_CELL
+            if self.carrying[team] and pos in self.bases[team]:
+                self.carrying[team] = False
+                self.flags[enemy] = self.flag_spawn[enemy]
+                self.scores[team] += 1
+
+        self.turn += 1
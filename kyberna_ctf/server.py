@@ -0,0 +1,333 @@
+"""Offline stand-in for the CTF server.
+
+:class:`LocalServer` implements the endpoints described in
+``docs/swagger.json`` on top of :class:`~kyberna_ctf.rules.Match` so bots can
+be evaluated without touching ``https://ctf.kyberna.cz``.  It can be used
+in-process, served over HTTP (``python -m kyberna_ctf.server``) for the
+regular client, or skipped entirely with :func:`simulate_game` which pits two
+``ALL_MODELS`` entries against each other directly.
+
+Every ``CreateSession`` call returns its own session id which identifies one
+seat of a match.  ``Ai`` sessions are played against a server-side model,
+while two ``Manual`` sessions on the same map are paired into one match.
+The server-side model thinks outside the server lock, so other sessions are
+served meanwhile.  Once a match is over its model is closed, and its seats
+are dropped after :data:`FINISHED_RETENTION` seconds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .ai import AIBase
+from .maps import LocalMap, default_maps
+from .models import ALL_MODELS
+from .rules import DEFAULT_MAX_TURNS, Match, other_team
+from .state import GameState
+
+# Chance per turn and side that a seeded simulated game replaces the model's
+# move with a random one, see :func:`simulate_game`.  Random openings alone
+# hardly change the outcome between deterministic models on these maps.
+MOVE_NOISE = 0.05
+
+# Seconds the seats of a finished match stay known, so the players can still
+# see the game over and fetch the final score.
+FINISHED_RETENTION = 60.0
+
+
+class ServerError(Exception):
+    """Error answered with an HTTP status code."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _Game:
+    """A match with the moves submitted for the current turn."""
+
+    def __init__(self, match: Match) -> None:
+        self.match = match
+        self.seats: Dict[str, str] = {}
+        self.pending: Dict[str, int] = {}
+        self.bot: Optional[AIBase] = None
+
+    @property
+    def started(self) -> bool:
+        return self.bot is not None or len(self.seats) == 2
+
+
+class _Seat:
+    __slots__ = ("player_id", "team", "game")
+
+    def __init__(self, player_id: str, team: str, game: _Game) -> None:
+        self.player_id = player_id
+        self.team = team
+        self.game = game
+
+
+class LocalServer:
+    """In-process implementation of the game API."""
+
+    def __init__(
+        self,
+        maps: Dict[str, LocalMap] | None = None,
+        opponent: str = "DijkstraAI",
+        max_turns: int = DEFAULT_MAX_TURNS,
+    ) -> None:
+        if opponent not in ALL_MODELS:
+            raise ValueError(f"Unknown AI model: {opponent}")
+        self.maps = maps if maps is not None else default_maps()
+        self.opponent = opponent
+        self.max_turns = max_turns
+        self._seats: Dict[str, _Seat] = {}
+        self._open_games: Dict[str, _Game] = {}
+        # Finished games by the time.monotonic() they ended, oldest first.
+        self._finished: Deque[Tuple[float, _Game]] = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Callable[[Dict], object]] = {
+            "/Game/AllMaps": self._all_maps,
+            "/Game/CreateSession": self._create_session,
+            "/Game/State": self._state,
+            "/Game/Map": self._map,
+            "/Game/Entities": self._entities,
+            "/Game/Move": self._move,
+            "/Game/Score": self._score,
+        }
+
+    def handle(self, endpoint: str, payload: Dict) -> object:
+        """Dispatch a request and return the JSON-serialisable response."""
+        route = self._routes.get(endpoint)
+        if route is None:
+            raise ServerError(404, f"Unknown endpoint: {endpoint}")
+        if not isinstance(payload, dict) or not payload.get("playerId"):
+            raise ServerError(400, "playerId is required.")
+        if route == self._move:
+            # Takes the lock itself to let the bot think without it.
+            return route(payload)
+        with self._lock:
+            self._prune()
+            return route(payload)
+
+    def _prune(self) -> None:
+        """Forget the seats of games finished longer than the retention ago."""
+        expired = time.monotonic() - FINISHED_RETENTION
+        while self._finished and self._finished[0][0] < expired:
+            _, game = self._finished.popleft()
+            for session_id in game.seats:
+                self._seats.pop(session_id, None)
+
+    def _advance(self, game: _Game) -> None:
+        """Play the turn once both moves are in; close the bot when it is over."""
+        if len(game.pending) < 2:
+            return
+        game.match.step(game.pending)
+        game.pending = {}
+        if game.match.over:
+            if game.bot is not None:
+                game.bot.close()
+            self._finished.append((time.monotonic(), game))
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+    def _all_maps(self, payload: Dict) -> List[str]:
+        return list(self.maps)
+
+    def _create_session(self, payload: Dict) -> Dict:
+        map_name = payload.get("mapName")
+        if map_name not in self.maps:
+            raise ServerError(400, f"Unknown map: {map_name}")
+        session_type = payload.get("type", "Manual")
+        if session_type not in ("Manual", "Ai"):
+            raise ServerError(400, f"Unknown session type: {session_type}")
+
+        game = self._open_games.pop(map_name, None) if session_type == "Manual" else None
+        if game is None:
+            game = _Game(Match(self.maps[map_name], self.max_turns))
+            team = "Red" if next(self._ids) % 2 else "Blue"
+            if session_type == "Ai":
+                game.bot = ALL_MODELS[self.opponent](team_color=other_team(team))
+            else:
+                self._open_games[map_name] = game
+        else:
+            team = other_team(next(iter(game.seats.values())))
+
+        session_id = f"local-{next(self._ids)}"
+        game.seats[session_id] = team
+        self._seats[session_id] = _Seat(payload["playerId"], team, game)
+        return {"sessionId": session_id, "teamsColor": team}
+
+    def _seat(self, payload: Dict) -> _Seat:
+        seat = self._seats.get(payload.get("sessionId"))
+        if seat is None or seat.player_id != payload["playerId"]:
+            raise ServerError(404, "Unknown session.")
+        return seat
+
+    def _state(self, payload: Dict) -> str:
+        seat = self._seat(payload)
+        game = seat.game
+        if game.match.over:
+            return "GameOver"
+        if not game.started or seat.team in game.pending:
+            return "Waiting"
+        return "Ready"
+
+    def _map(self, payload: Dict) -> Dict:
+        return self._seat(payload).game.match.game_map
+
+    def _entities(self, payload: Dict) -> List[Dict]:
+        return self._seat(payload).game.match.entities()
+
+    def _score(self, payload: Dict) -> Dict:
+        return self._seat(payload).game.match.score()
+
+    def _move(self, payload: Dict) -> bool:
+        with self._lock:
+            self._prune()
+            seat = self._seat(payload)
+            direction = payload.get("direction")
+            if not isinstance(direction, int) or not 1 <= direction <= 6:
+                raise ServerError(400, "direction must be between 1 and 6.")
+            game = seat.game
+            match = game.match
+            if match.over or not game.started or seat.team in game.pending:
+                return False
+            game.pending[seat.team] = direction
+            bot = game.bot
+            if bot is None:
+                self._advance(game)
+                return True
+            entities, score = match.entities(), match.score()
+        # The match only changes once the bot has moved, and the player's
+        # seat stays Waiting until then, so nobody else touches this game.
+        try:
+            bot_move = int(bot.choose_move(match.cmap, entities, score))
+        except Exception as exc:
+            # Take the move back so the player can retry instead of the
+            # game waiting forever for a bot move.
+            with self._lock:
+                game.pending.pop(seat.team, None)
+            raise ServerError(500, f"Server AI failed: {exc!r}") from exc
+        with self._lock:
+            game.pending[bot.team_color] = bot_move
+            self._advance(game)
+        return True
+
+
+# ----------------------------------------------------------------------
+# HTTP front end
+# ----------------------------------------------------------------------
+def make_http_server(server: LocalServer, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Return an HTTP server exposing ``server`` with the real API paths."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, body = 200, server.handle(self.path, payload)
+            except ServerError as exc:
+                status, body = exc.status, str(exc)
+            except ValueError:
+                status, body = 400, "Invalid JSON body."
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+# ----------------------------------------------------------------------
+# Direct simulation
+# ----------------------------------------------------------------------
+def simulate_game(
+    red: str,
+    blue: str,
+    local_map: LocalMap,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    seed: int | None = None,
+) -> Dict:
+    """Play ``red`` against ``blue`` (``ALL_MODELS`` names) on ``local_map``.
+
+    Returns the final score, the number of turns and the total decision time
+    of each team in seconds.  Deterministic models play the same game every
+    time; with a ``seed`` each move is replaced by a random one with chance
+    :data:`MOVE_NOISE`, drawn from it, so games with different seeds differ.
+    """
+    match = Match(local_map, max_turns)
+    ais = {
+        "Red": ALL_MODELS[red](team_color="Red"),
+        "Blue": ALL_MODELS[blue](team_color="Blue"),
+    }
+    think = {"Red": 0.0, "Blue": 0.0}
+    rng = random.Random(seed) if seed is not None else None
+    try:
+        while not match.over:
+            entities = match.entities()
+            score = match.score()
+            moves = {}
+            for team, ai in ais.items():
+                start = time.perf_counter()
+                state = GameState.from_entities(entities, team, match.cmap.width, score)
+                if rng is not None and rng.random() < MOVE_NOISE:
+                    ai.observe(match.cmap, state, score)
+                    moves[team] = rng.randint(1, 6)
+                else:
+                    moves[team] = int(ai.choose_move(match.cmap, state, score))
+                think[team] += time.perf_counter() - start
+            match.step(moves)
+    finally:
+        for ai in ais.values():
+            ai.close()
+    return {
+        "map": local_map.name,
+        "red": red,
+        "blue": blue,
+        "score": match.score(),
+        "turns": match.turn,
+        "think_time": think,
+        "seed": seed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local Kyberna CTF server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--opponent",
+        default="DijkstraAI",
+        help="AI model playing the server side of Ai sessions",
+    )
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    args = parser.parse_args()
+
+    server = LocalServer(opponent=args.opponent, max_turns=args.max_turns)
+    httpd = make_http_server(server, args.host, args.port)
+    print(f"Serving maps {', '.join(server.maps)} on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Speculative replies computed during the opponent's turn.
+
+After our move is sent the next state is nearly known: we know where our
+player ends up and the opponent can only take one of six steps.
+:class:`SpeculativeAI` wraps a model and, while we wait for the opponent,
+computes the reply to every one of those states on a :meth:`~AIBase.fork` of
+the model.  When the real state matches a prediction the reply is returned
+straight away and the wrapped model continues from the fork (see
+:meth:`~AIBase.adopt`); otherwise it decides as usual.  Setting
+:attr:`SpeculativeAI.cancel` stops the preparation once the opponent has
+answered, keeping the replies computed so far.
+
+The flags' starting cells are taken from the first state in which both
+flags are on the map; until then a returned or captured flag is not
+predicted and such a turn is computed normally.
+"""
+
+from __future__ import annotations
+
+import time
+from threading import Event
+from typing import Dict, List, Tuple
+
+from .ai import AIBase
+from .hexmap import NO_CELL, CompiledMap
+from .state import GameState
+
+
+def _advance(
+    player: int,
+    flags: Tuple[int, ...],
+    spawns: Tuple[int, ...] | None,
+    bases: Tuple[int, ...],
+    score: int,
+    met: bool,
+) -> Tuple[Tuple[int, ...], int]:
+    """Apply meeting, pickup and capture for the side whose target is ``flags``.
+
+    Returns the new ``flags`` (the flags this side is after) and its score.
+    A carried flag respawns at ``spawns``; when those are unknown the flag
+    is left as it is and the prediction simply misses.  Like in
+    :meth:`~kyberna_ctf.rules.Match.step` a flag returned by a meeting can be
+    picked up again in the same turn when the player stands on its spawn.
+    """
+    carrying = not flags
+    if carrying and met and spawns:
+        flags = spawns
+        carrying = False
+    if not carrying and player in flags:
+        flags = tuple(f for f in flags if f != player)
+        carrying = not flags
+    if carrying and player in bases and spawns:
+        return spawns, score + 1
+    return flags, score
+
+
+def predict_states(
+    cmap: CompiledMap,
+    state: GameState,
+    move: int,
+    spawns: Tuple[Tuple[int, ...], Tuple[int, ...]] | None = None,
+) -> List[GameState]:
+    """Return the states reachable after our ``move`` from ``state``.
+
+    There is one state per distinct cell the enemy player can end up on.
+    Blocked moves leave a player in place like on the server, and flag
+    pickups, returns and captures follow :mod:`kyberna_ctf.rules`.
+    ``spawns`` holds the starting cells of our and the enemy's flags.
+    """
+    own_spawn, enemy_spawn = spawns if spawns is not None else (None, None)
+    player = state.player
+    if player != NO_CELL:
+        nxt = cmap.neighbor(player, move)
+        if nxt != NO_CELL:
+            player = nxt
+    enemy = state.enemy_player
+    if enemy == NO_CELL:
+        destinations = [NO_CELL]
+    else:
+        destinations = [enemy] + [cell for _, cell in cmap.adjacency[enemy]]
+    predicted = []
+    for cell in destinations:
+        met = player != NO_CELL and (
+            player == cell or (player == state.enemy_player and cell == state.player)
+        )
+        guess = state.copy()
+        guess.player = player
+        guess.enemy_player = cell
+        guess.enemy_flags, guess.score = _advance(
+            player, state.enemy_flags, enemy_spawn, state.bases, state.score, met
+        )
+        guess.flags, guess.enemy_score = _advance(
+            cell, state.flags, own_spawn, state.enemy_bases, state.enemy_score, met
+        )
+        predicted.append(guess)
+    return predicted
+
+
+class SpeculativeAI(AIBase):
+    """Wrap ``inner`` and precompute its replies with :meth:`prepare`.
+
+    ``cancel`` is the event interrupting :meth:`prepare`; a new one is made
+    unless given (e.g. one shared with another process).  The caller clears
+    it before starting a preparation and sets it to stop one.
+    """
+
+    speculative = True
+
+    def __init__(self, inner: AIBase, cancel: Event | None = None) -> None:
+        super().__init__(inner.team_color)
+        self.inner = inner
+        self.cancel = Event() if cancel is None else cancel
+        self.metrics = inner.metrics
+        self.hits = 0
+        self.misses = 0
+        self._replies: Dict[Tuple, Tuple[int, AIBase]] = {}
+        self._spawns: Tuple[Tuple[int, ...], Tuple[int, ...]] | None = None
+
+    @property
+    def name(self) -> str:
+        return self.inner.name
+
+    def prepare(
+        self,
+        game_map: dict | CompiledMap,
+        entities: list | GameState,
+        score: dict | None,
+        move: int,
+        deadline: float | None = None,
+    ) -> int:
+        """Precompute replies for the states following our ``move``.
+
+        Returns the number of prepared replies.  Each reply gets an equal
+        share of the time left until ``deadline`` as its own deadline, so the
+        last one does not overrun it.  Once :attr:`cancel` is set the reply in
+        progress is abandoned and the ones finished before are kept.
+        """
+        cmap = self.compiled_map(game_map)
+        state = self.game_state(cmap, entities, score)
+        cancel = self.cancel
+        replies = {}
+        guesses = predict_states(cmap, state, move, self._spawns)
+        for i, guess in enumerate(guesses):
+            if cancel.is_set() or self.out_of_time(deadline):
+                break
+            share = None
+            if deadline is not None:
+                now = time.perf_counter()
+                share = now + (deadline - now) / (len(guesses) - i)
+            fork = self.inner.fork(cancel)
+            reply = int(fork.decide(cmap, guess, score, share))
+            if cancel.is_set():
+                # Cut short, so possibly worse than a regular decision.
+                break
+            replies[guess.key()] = (reply, fork)
+        self._replies = replies
+        return len(replies)
+
+    def choose_move(
+        self,
+        game_map: dict | CompiledMap,
+        entities: list,
+        score: dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        state = self.game_state(game_map, entities, score)
+        if self._spawns is None and state.flags and state.enemy_flags:
+            self._spawns = (state.flags, state.enemy_flags)
+        replies, self._replies = self._replies, {}
+        if replies:
+            entry = replies.get(state.key())
+            self.metrics.cache("speculation", entry is not None)
+            if entry is not None:
+                self.hits += 1
+                move, fork = entry
+                # The fork has already seen this state; continue from it.
+                self.inner.adopt(fork)
+                return move
+            self.misses += 1
+        return self.inner.decide(game_map, state, score, deadline)
+
+    # The wrapped model consults the opening book itself.
+    decide = choose_move
+
+    def close(self) -> None:
+        # Forks share the inner model's resources.
+        self.inner.close()
+
+    def describe(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        text = f"{self.hits}/{total} speculative replies used ({rate:.0f}%)"
+        details = self.inner.describe()
+        return f"{text}, {details}" if details else text
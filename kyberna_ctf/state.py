@@ -0,0 +1,152 @@
+"""Compact game state parsed once per turn.
+
+The server sends the entities as a list of dicts.  :class:`GameState` parses
+that list once from the point of view of one team into cell indices, so the
+models no longer walk the raw dicts and compare strings themselves.  It still
+iterates over the raw entity dicts, which keeps code written against the
+``entities`` list working unchanged.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .hexmap import NO_CELL
+
+
+class GameState:
+    """Positions and scores of one turn seen by ``team_color``.
+
+    Positions are row-major cell indices (``y * width + x``); a missing
+    player is :data:`~kyberna_ctf.hexmap.NO_CELL`.  A flag that is being
+    carried is absent from ``flags``/``enemy_flags``.
+    """
+
+    __slots__ = (
+        "team_color",
+        "width",
+        "player",
+        "enemy_player",
+        "bases",
+        "enemy_bases",
+        "flags",
+        "enemy_flags",
+        "score",
+        "enemy_score",
+        "scores",
+        "entities",
+    )
+
+    def __init__(
+        self,
+        team_color: str | None,
+        width: int,
+        player: int = NO_CELL,
+        enemy_player: int = NO_CELL,
+        bases: Tuple[int, ...] = (),
+        enemy_bases: Tuple[int, ...] = (),
+        flags: Tuple[int, ...] = (),
+        enemy_flags: Tuple[int, ...] = (),
+        scores: Dict | None = None,
+        entities: List[Dict] | None = None,
+    ) -> None:
+        self.team_color = team_color
+        self.width = width
+        self.player = player
+        self.enemy_player = enemy_player
+        self.bases = bases
+        self.enemy_bases = enemy_bases
+        self.flags = flags
+        self.enemy_flags = enemy_flags
+        self.scores = scores if isinstance(scores, dict) else {}
+        enemy_color = "Red" if team_color == "Blue" else "Blue"
+        self.score = self.scores.get(team_color, 0)
+        self.enemy_score = self.scores.get(enemy_color, 0)
+        self.entities = entities if entities is not None else []
+
+    @classmethod
+    def from_entities(
+        cls,
+        entities: List[Dict],
+        team_color: str | None,
+        width: int,
+        scores: Dict | None = None,
+    ) -> "GameState":
+        """Parse the ``/Game/Entities`` payload for ``team_color``."""
+        player = enemy_player = NO_CELL
+        bases: List[int] = []
+        enemy_bases: List[int] = []
+        flags: List[int] = []
+        enemy_flags: List[int] = []
+        for e in entities:
+            loc = e["location"]
+            cell = loc["y"] * width + loc["x"]
+            own = e["teamColor"] == team_color
+            kind = e["type"]
+            if kind == "Player":
+                if own:
+                    player = cell
+                else:
+                    enemy_player = cell
+            elif kind == "Base":
+                (bases if own else enemy_bases).append(cell)
+            elif kind == "Flag":
+                (flags if own else enemy_flags).append(cell)
+        return cls(
+            team_color,
+            width,
+            player,
+            enemy_player,
+            tuple(bases),
+            tuple(enemy_bases),
+            tuple(flags),
+            tuple(enemy_flags),
+            scores,
+            entities,
+        )
+
+    def copy(self) -> "GameState":
+        """Return a shallow copy; all position fields are immutable."""
+        clone = GameState.__new__(GameState)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def key(self) -> Tuple:
+        """Return the hashable parts of the state a decision depends on."""
+        return (
+            self.player,
+            self.enemy_player,
+            self.flags,
+            self.enemy_flags,
+            self.score,
+            self.enemy_score,
+        )
+
+    # ------------------------------------------------------------------
+    # Convenience accessors
+    # ------------------------------------------------------------------
+    def coords(self, cell: int) -> Optional[Tuple[int, int]]:
+        """Return ``(x, y)`` of ``cell`` or ``None`` for :data:`NO_CELL`."""
+        if cell == NO_CELL:
+            return None
+        return cell % self.width, cell // self.width
+
+    @property
+    def carrying(self) -> bool:
+        """Whether we hold the enemy flag (it vanished from the entities)."""
+        return not self.enemy_flags
+
+    @property
+    def enemy_carrying(self) -> bool:
+        """Whether the enemy holds our flag."""
+        return not self.flags
+
+    # ------------------------------------------------------------------
+    # Compatibility with the raw entity list
+    # ------------------------------------------------------------------
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.entities)
+
+    def __len__(self) -> int:
+        return len(self.entities)
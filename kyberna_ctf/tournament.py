@@ -0,0 +1,208 @@
+"""Headless round-robin tournaments between AI models.
+
+Games are simulated with :func:`~kyberna_ctf.server.simulate_game` on a
+process pool, one game per task, so no browser or network is involved.
+Repeated games of a pairing are seeded differently so that they are not
+copies of one game.  The results are stored with
+:class:`~kyberna_ctf.results.ResultStore`::
+
+    python -m kyberna_ctf.tournament --models DijkstraAI,RatioAI --games 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from .maps import LocalMap, default_maps, load_maps
+from .models import ALL_MODELS
+from .results import ResultStore, simulated_results
+from .rules import DEFAULT_MAX_TURNS
+from .server import simulate_game
+
+# Maps available to the worker processes, set by ``_init_worker``.
+_WORKER_MAPS: Dict[str, LocalMap] = {}
+
+
+def _resolve_maps(map_dir: str | None) -> Dict[str, LocalMap]:
+    return load_maps(Path(map_dir)) if map_dir else default_maps()
+
+
+def _init_worker(map_dir: str | None) -> None:
+    global _WORKER_MAPS
+    _WORKER_MAPS = _resolve_maps(map_dir)
+
+
+def _play(red: str, blue: str, map_name: str, seed: int | None, max_turns: int) -> Dict:
+    return simulate_game(red, blue, _WORKER_MAPS[map_name], max_turns, seed)
+
+
+def schedule(models: List[str], map_names: Iterable[str], games: int) -> List[tuple]:
+    """Return ``(red, blue, map, seed)`` for every game of a round robin.
+
+    Each pairing is played ``games`` times per map with both colour
+    assignments.  The first game is played as is (seed ``None``), every
+    repeat from its own seed with occasional random moves, see
+    :func:`~kyberna_ctf.server.simulate_game`; otherwise deterministic models
+    would just replay the first game.
+    """
+    fixtures = []
+    for map_name in map_names:
+        for a, b in itertools.combinations(models, 2):
+            for game in range(games):
+                seed = game or None
+                fixtures.append((a, b, map_name, seed))
+                fixtures.append((b, a, map_name, seed))
+    return fixtures
+
+
+class Standings:
+    """Aggregated results of a tournament per model."""
+
+    def __init__(self, models: Iterable[str]) -> None:
+        self.rows = {
+            m: {
+                "games": 0,
+                "wins": 0,
+                "draws": 0,
+                "losses": 0,
+                "ratio_sum": 0.0,
+                "think": 0.0,
+                "turns": 0,
+            }
+            for m in models
+        }
+
+    def add(self, result: Dict) -> None:
+        score = result["score"]
+        for team, model in (("Red", result["red"]), ("Blue", result["blue"])):
+            opp = "Blue" if team == "Red" else "Red"
+            row = self.rows[model]
+            row["games"] += 1
+            row["turns"] += result["turns"]
+            row["think"] += result["think_time"][team]
+            # Smoothed so that shutouts do not produce infinite ratios.
+            row["ratio_sum"] += (score[team] + 1) / (score[opp] + 1)
+            if score[team] > score[opp]:
+                row["wins"] += 1
+            elif score[team] < score[opp]:
+                row["losses"] += 1
+            else:
+                row["draws"] += 1
+
+    def table(self) -> str:
+        lines = [
+            f"{'Model':<16} {'Games':>6} {'Win%':>6} {'Draw%':>6} {'Ratio':>6} {'ms/turn':>8}"
+        ]
+        ranked = sorted(
+            self.rows.items(),
+            key=lambda kv: kv[1]["wins"] / kv[1]["games"] if kv[1]["games"] else 0,
+            reverse=True,
+        )
+        for model, row in ranked:
+            n = row["games"] or 1
+            per_turn = row["think"] / row["turns"] * 1000 if row["turns"] else 0.0
+            lines.append(
+                f"{model:<16} {row['games']:>6} {row['wins'] / n:>6.1%} "
+                f"{row['draws'] / n:>6.1%} {row['ratio_sum'] / n:>6.2f} {per_turn:>8.2f}"
+            )
+        return "\n".join(lines)
+
+
+def run_tournament(
+    models: List[str],
+    map_names: List[str] | None = None,
+    games: int = 1,
+    workers: int | None = None,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    map_dir: str | None = None,
+    record: bool = True,
+) -> Standings:
+    """Play a round robin between ``models`` and print the standings.
+
+    With ``record`` every game is added to the results database.
+    """
+    for name in models:
+        if name not in ALL_MODELS:
+            raise ValueError(f"Unknown AI model: {name}")
+    available = _resolve_maps(map_dir)
+    if not map_names:
+        map_names = list(available)
+    for name in map_names:
+        if name not in available:
+            raise ValueError(f"Unknown map: {name}")
+
+    fixtures = schedule(models, map_names, games)
+    standings = Standings(models)
+    start = time.perf_counter()
+    store = ResultStore() if record else None
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(map_dir,),
+        ) as pool:
+            futures = [pool.submit(_play, *fixture, max_turns) for fixture in fixtures]
+            for future in as_completed(futures):
+                result = future.result()
+                standings.add(result)
+                if store is not None:
+                    store.record_many(simulated_results(result))
+    finally:
+        if store is not None:
+            store.close()
+    elapsed = time.perf_counter() - start
+
+    print(standings.table())
+    print(
+        f"{len(fixtures)} games in {elapsed:.1f}s "
+        f"({len(fixtures) / elapsed if elapsed else 0:.1f} games/s)"
+    )
+    return standings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an offline AI tournament")
+    parser.add_argument(
+        "--models",
+        default=",".join(ALL_MODELS),
+        help="Comma separated list of AI models (default: all)",
+    )
+    parser.add_argument("--maps", help="Comma separated list of maps (default: all)")
+    parser.add_argument("--map-dir", help="Directory with LocalMap JSON files")
+    parser.add_argument(
+        "--games",
+        type=int,
+        default=1,
+        help="Games per pairing, map and colour; repeats make occasional random moves",
+    )
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument(
+        "--no-record", action="store_true", help="Do not store the games in the results database"
+    )
+    args = parser.parse_args()
+
+    models = [n.strip() for n in args.models.split(",") if n.strip()]
+    map_names = [n.strip() for n in args.maps.split(",") if n.strip()] if args.maps else None
+    try:
+        run_tournament(
+            models,
+            map_names,
+            args.games,
+            args.workers,
+            args.max_turns,
+            args.map_dir,
+            not args.no_record,
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+
+if __name__ == "__main__":
+    main()
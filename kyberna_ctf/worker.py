@@ -0,0 +1,204 @@
+"""Run AI models in worker processes.
+
+``choose_move`` is CPU bound, and the session loops play several games from
+one process, so their models would otherwise compete for the GIL.
+:class:`RemoteAI` stands in for a model and forwards every decision to a
+persistent worker process that owns the real model instance.  Model state such
+as a carried flag therefore stays resident in the worker between turns.
+
+The map is shipped once per session as its passability grid in a
+:mod:`multiprocessing.shared_memory` block, and the worker compiles it there.
+After that, only the parsed :class:`~kyberna_ctf.state.GameState` and the score
+cross the pipe each turn.  A speculative worker wraps its model in
+:class:`~kyberna_ctf.speculation.SpeculativeAI` and prepares replies on
+request; the cancel event is shared with the worker so a preparation can be
+stopped while the worker is busy with it.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory, util
+
+from .ai import AIBase
+from .hexmap import CompiledMap
+from .metrics import Metrics
+from .speculation import SpeculativeAI
+
+# Workers are spawned rather than forked: the session loops run threads (fetch
+# pools, move guards) that must not be duplicated into the child.
+_CONTEXT = mp.get_context("spawn")
+
+# Seconds to wait for a worker to exit before it is terminated.
+SHUTDOWN_TIMEOUT = 2.0
+
+
+def _deadline(budget: float | None) -> float | None:
+    return None if budget is None else time.perf_counter() + budget
+
+
+def _serve(conn, ai_cls: type[AIBase], team_color: str | None, cancel) -> None:
+    """Worker loop: answer requests until ``close``.
+
+    ``cancel`` is the shared event of a speculative model, else ``None``.
+    """
+    ai = ai_cls(team_color=team_color)
+    if cancel is not None:
+        ai = SpeculativeAI(ai, cancel)
+    cmap: CompiledMap | None = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        kind = message[0]
+        if kind == "close":
+            break
+        try:
+            if kind == "map":
+                _, name, width, height = message
+                shm = shared_memory.SharedMemory(name=name)
+                try:
+                    cmap = CompiledMap(width, height, bytes(shm.buf[: width * height]))
+                finally:
+                    shm.close()
+                conn.send(("ok", None))
+            elif kind == "move":
+                _, state, score, budget = message
+                conn.send(("ok", int(ai.decide(cmap, state, score, _deadline(budget)))))
+            elif kind == "prepare":
+                _, state, score, move, budget = message
+                conn.send(("ok", ai.prepare(cmap, state, score, move, _deadline(budget))))
+            elif kind == "describe":
+                conn.send(("ok", ai.describe()))
+            elif kind == "metrics":
+                conn.send(("ok", ai.collect_metrics()))
+            else:
+                raise ValueError(f"Unknown worker request: {kind}")
+        except Exception as exc:  # reported to the caller
+            conn.send(("error", exc))
+    ai.close()
+    conn.close()
+
+
+def _shutdown(conn, process) -> None:
+    if process.is_alive():
+        try:
+            conn.send(("close",))
+        except (BrokenPipeError, OSError):
+            pass
+        process.join(SHUTDOWN_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    conn.close()
+
+
+class RemoteAI(AIBase):
+    """Proxy running ``ai_cls`` in a dedicated worker process.
+
+    It is used like the model itself; call :meth:`close` (or use it as a
+    context manager) to stop the worker.  :meth:`fallback_move` runs locally
+    so it stays available while the worker is busy.  With ``speculative``
+    the worker also supports :meth:`prepare` and :attr:`cancel` like
+    :class:`~kyberna_ctf.speculation.SpeculativeAI`.
+    """
+
+    def __init__(
+        self,
+        ai_cls: type[AIBase],
+        team_color: str | None = None,
+        speculative: bool = False,
+    ) -> None:
+        super().__init__(team_color)
+        self.ai_cls = ai_cls
+        self.speculative = speculative
+        self.cancel = _CONTEXT.Event() if speculative else None
+        self._conn, child = _CONTEXT.Pipe()
+        # Not a daemon so that models may start processes of their own (see
+        # MCTSAI); the finalizer stops the worker at interpreter exit instead.
+        self._process = _CONTEXT.Process(
+            target=_serve,
+            args=(child, ai_cls, team_color, self.cancel),
+            name=f"{ai_cls.__name__}-worker",
+        )
+        self._process.start()
+        child.close()
+        self._shipped: CompiledMap | None = None
+        self._finalizer = util.Finalize(
+            self, _shutdown, args=(self._conn, self._process), exitpriority=10
+        )
+
+    @property
+    def name(self) -> str:
+        return self.ai_cls.__name__
+
+    def __enter__(self) -> "RemoteAI":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _request(self, message: tuple):
+        self._conn.send(message)
+        status, value = self._conn.recv()
+        if status == "error":
+            raise value
+        return value
+
+    def _ship_map(self, cmap: CompiledMap) -> None:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, cmap.size))
+        try:
+            shm.buf[: cmap.size] = cmap.passable
+            self._request(("map", shm.name, cmap.width, cmap.height))
+        finally:
+            shm.close()
+            shm.unlink()
+        self._shipped = cmap
+
+    def _encode(self, game_map, entities, score, deadline):
+        cmap = self.compiled_map(game_map)
+        if cmap is not self._shipped:
+            self._ship_map(cmap)
+        state = self.game_state(cmap, entities, score)
+        # perf_counter values are not comparable across processes, so the
+        # deadline travels as the remaining budget.
+        budget = None if deadline is None else deadline - time.perf_counter()
+        return state, budget
+
+    def choose_move(
+        self,
+        game_map: dict | CompiledMap,
+        entities: list,
+        score: dict | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        state, budget = self._encode(game_map, entities, score, deadline)
+        return self._request(("move", state, score, budget))
+
+    # The worker consults the opening book itself.
+    decide = choose_move
+
+    def prepare(
+        self,
+        game_map: dict | CompiledMap,
+        entities: list,
+        score: dict | None,
+        move: int,
+        deadline: float | None = None,
+    ) -> int:
+        """Let a speculative worker precompute replies to our ``move``."""
+        state, budget = self._encode(game_map, entities, score, deadline)
+        return self._request(("prepare", state, score, move, budget))
+
+    def describe(self) -> str:
+        return self._request(("describe",))
+
+    def collect_metrics(self) -> Metrics:
+        """Return the metrics recorded by the model in the worker."""
+        return self._request(("metrics",))
+
+    def close(self) -> None:
+        """Stop the worker process."""
+        self._finalizer()
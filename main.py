@@ -1,5 +1,6 @@
 import argparse
-from kyberna_ctf.game import run_game, run_games
+
+from kyberna_ctf.game import DEFAULT_MOVE_BUDGET, VIEW_MODES, run_game, run_games
 from kyberna_ctf.models import ALL_MODELS
 
 # Player ID (could be prompted or configured)
@@ -14,14 +15,143 @@ if __name__ == "__main__":
         help="Comma separated list of AI models to run concurrently",
     )
     parser.add_argument("--map", dest="map_name", help="Map name to play")
+    parser.add_argument(
+        "--maps",
+        help="Comma separated list of maps, or 'all', to play a campaign of "
+        "every AI on every map",
+    )
+    parser.add_argument(
+        "--campaign",
+        default="default",
+        help="Campaign name; a campaign of the same name resumes where it stopped",
+    )
+    parser.add_argument(
+        "--games", type=int, default=1, help="Campaign sessions per AI and map"
+    )
+    # The campaign defaults live in kyberna_ctf.campaign, which is only
+    # imported when a campaign is played.
+    parser.add_argument(
+        "--workers", type=int, help="Campaign sessions played at once"
+    )
+    parser.add_argument(
+        "--server-limit", type=int, help="Campaign sessions open on the server at once"
+    )
+    parser.add_argument(
+        "--retries", type=int, help="Retries of a failed campaign session"
+    )
+    parser.add_argument(
+        "--view",
+        choices=VIEW_MODES,
+        help="Show the game board in a browser (default: headed for manual "
+        "play, none for AI sessions)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Drive all AI sessions from one asyncio event loop (no browser)",
+    )
+    parser.add_argument(
+        "--move-budget",
+        type=float,
+        default=DEFAULT_MOVE_BUDGET,
+        help="Seconds an AI may think per move before a fallback move is sent "
+        f"(default: {DEFAULT_MOVE_BUDGET})",
+    )
+    placement = parser.add_mutually_exclusive_group()
+    placement.add_argument(
+        "--in-process",
+        dest="worker",
+        action="store_false",
+        default=None,
+        help="Run the AI models in this process instead of one worker process "
+        "per session (default with --async)",
+    )
+    placement.add_argument(
+        "--worker-process",
+        dest="worker",
+        action="store_true",
+        default=None,
+        help="Run every AI model in a worker process of its own (default "
+        "without --async)",
+    )
+    parser.add_argument(
+        "--speculate",
+        action="store_true",
+        help="Precompute replies to every opponent move while waiting for "
+        "our turn",
+    )
     args = parser.parse_args()
 
+    if args.maps and not args.ais:
+        raise SystemExit("A campaign needs the AI models to play (--ais).")
+    if args.maps and args.use_async:
+        raise SystemExit("Campaigns run their sessions on threads; drop --async.")
+    if args.worker is None:
+        # Hundreds of async sessions cannot each have a process of their own.
+        args.worker = not args.use_async
     if args.ais:
         ai_names = [n.strip() for n in args.ais.split(",") if n.strip()]
         for name in ai_names:
             if name not in ALL_MODELS:
                 raise SystemExit(f"Unknown AI model: {name}")
-        run_games(PLAYER_ID, ai_names, args.map_name)
+        if args.maps:
+            from kyberna_ctf import campaign
+
+            maps = None
+            if args.maps != "all":
+                maps = [n.strip() for n in args.maps.split(",") if n.strip()]
+            limits = {
+                key: value
+                for key, value in (
+                    ("workers", args.workers),
+                    ("server_limit", args.server_limit),
+                    ("retries", args.retries),
+                )
+                if value is not None
+            }
+            campaign.run_campaign(
+                PLAYER_ID,
+                ai_names,
+                maps,
+                args.games,
+                args.campaign,
+                move_budget=args.move_budget,
+                worker=args.worker,
+                speculate=args.speculate,
+                **limits,
+            )
+        elif args.use_async:
+            import asyncio
+
+            from kyberna_ctf.async_game import run_games_async
+
+            asyncio.run(
+                run_games_async(
+                    PLAYER_ID,
+                    ai_names,
+                    args.map_name,
+                    move_budget=args.move_budget,
+                    worker=args.worker,
+                    speculate=args.speculate,
+                )
+            )
+        else:
+            run_games(
+                PLAYER_ID,
+                ai_names,
+                args.map_name,
+                args.view,
+                args.move_budget,
+                args.worker,
+                args.speculate,
+            )
     else:
-        run_game(PLAYER_ID)
+        run_game(
+            PLAYER_ID,
+            view=args.view,
+            move_budget=args.move_budget,
+            worker=args.worker,
+            speculate=args.speculate,
+        )
 
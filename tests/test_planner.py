@@ -0,0 +1,100 @@
+"""Randomised checks of the incremental planner against plain searches."""
+
+import random
+from heapq import heappop, heappush
+
+import pytest
+
+from kyberna_ctf.distances import UNREACHABLE
+from kyberna_ctf.fields import distance_field
+from kyberna_ctf.hexmap import CompiledMap
+from kyberna_ctf.maps import generate_map
+from kyberna_ctf.planner import MIN_STEP_COST, IncrementalPlanner
+
+
+def _dijkstra(cmap, start, goal, cost):
+    """Reference cost of the cheapest path, entering cell ``i`` for ``cost[i]``."""
+    best = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        d, cell = heappop(heap)
+        if cell == goal:
+            return d
+        if d > best[cell]:
+            continue
+        for _, nxt in cmap.adjacency[cell]:
+            nd = d + cost[nxt]
+            if nd < best.get(nxt, float("inf")):
+                best[nxt] = nd
+                heappush(heap, (nd, nxt))
+    return None
+
+
+def _path_cost(cmap, planner, cost):
+    cells = planner.path_cells()
+    assert cells[0] == planner.start and cells[-1] == planner.goal
+    total = 0.0
+    for cell, nxt in zip(cells, cells[1:]):
+        assert nxt in [j for _, j in cmap.adjacency[cell]]
+        total += cost[nxt]
+    assert len(planner.path()) == len(cells) - 1
+    return total
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_unit_cost_matches_bfs(seed):
+    rnd = random.Random(seed)
+    style = ("random", "corridors", "maze")[seed % 3]
+    cmap = CompiledMap.from_game_map(generate_map("t", 24, 16, 0.25, seed, style).game_map)
+    cells = [i for i in range(cmap.size) if cmap.passable[i]]
+    planner = IncrementalPlanner(cmap)
+    goal = rnd.choice(cells)
+    field = distance_field(cmap, [goal])
+    start = rnd.choice(cells)
+    for _ in range(60):
+        if rnd.random() < 0.1:
+            goal = rnd.choice(cells)
+            field = distance_field(cmap, [goal])
+        found = planner.plan(start, goal)
+        if field[start] == UNREACHABLE:
+            assert not found and planner.cost() is None
+        else:
+            assert found and planner.cost() == field[start]
+            assert _path_cost(cmap, planner, [1.0] * cmap.size) == field[start]
+        # Walk one step along the plan, or jump somewhere else.
+        move = planner.first_move() if found else None
+        if move is not None and rnd.random() < 0.8:
+            start = cmap.neighbor(start, move)
+        else:
+            start = rnd.choice(cells)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_changing_costs_match_dijkstra(seed):
+    rnd = random.Random(100 + seed)
+    cmap = CompiledMap.from_game_map(generate_map("t", 20, 14, 0.2, seed).game_map)
+    cells = [i for i in range(cmap.size) if cmap.passable[i]]
+    planner = IncrementalPlanner(cmap)
+    cost = [rnd.uniform(0.5, 3.0) for _ in range(cmap.size)]
+    goal = rnd.choice(cells)
+    start = rnd.choice(cells)
+    for _ in range(40):
+        # Local changes are repaired, larger ones rebuild the search tree.
+        centre = rnd.choice(cells)
+        radius = rnd.choice((1, 2, 3, 12))
+        for cell in cells:
+            if cmap.hex_distance(cell, centre) <= radius:
+                cost[cell] = rnd.uniform(0.0, 4.0)
+        if rnd.random() < 0.1:
+            goal = rnd.choice(cells)
+        found = planner.plan(start, goal, cost)
+        effective = [max(c, MIN_STEP_COST) for c in cost]
+        expected = _dijkstra(cmap, start, goal, effective)
+        if expected is None:
+            assert not found
+            continue
+        assert found
+        assert planner.cost() == pytest.approx(expected)
+        assert _path_cost(cmap, planner, effective) == pytest.approx(expected)
+        move = planner.first_move()
+        start = cmap.neighbor(start, move) if move is not None else rnd.choice(cells)
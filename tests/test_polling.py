@@ -0,0 +1,48 @@
+"""Opponent latency estimates of the adaptive poller on a fake clock."""
+
+import pytest
+
+from kyberna_ctf.polling import MIN_POLL_INTERVAL, AdaptivePoller
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _play(latency, turns=30):
+    """Let an opponent answer ``latency`` seconds after each of our moves."""
+    clock = _Clock()
+    poller = AdaptivePoller(clock=clock)
+    for _ in range(turns):
+        poller.move_sent()
+        answered = clock.now + latency
+        while True:
+            clock.now += poller.next_interval()
+            if clock.now >= answered:
+                break
+        poller.ready()
+        # Our own think time.
+        clock.now += 0.05
+    return poller
+
+
+def test_first_wait_starts_at_minimum():
+    clock = _Clock()
+    poller = AdaptivePoller(clock=clock)
+    poller.move_sent()
+    assert poller.next_interval() == MIN_POLL_INTERVAL
+
+
+def test_instant_opponent_is_not_measured_as_the_sleep():
+    poller = _play(0.0)
+    assert max(poller.latencies[-10:]) <= MIN_POLL_INTERVAL / 2 + 1e-9
+
+
+@pytest.mark.parametrize("latency", [0.05, 0.2, 0.7])
+def test_estimate_tracks_the_opponent(latency):
+    poller = _play(latency)
+    assert poller.expected_latency() == pytest.approx(latency, abs=max(0.03, latency * 0.15))
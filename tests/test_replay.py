@@ -0,0 +1,91 @@
+"""Round trip of the binary replay format."""
+
+import random
+
+import pytest
+
+from kyberna_ctf.hexmap import compile_map
+from kyberna_ctf.maps import generate_map
+from kyberna_ctf.replay import ReplayWriter, load_replay, map_crc
+from kyberna_ctf.rules import Match
+
+
+def _key(entities):
+    return sorted(
+        (e["gameEntityId"], e["type"], e["teamColor"], e["location"]["x"], e["location"]["y"])
+        for e in entities
+    )
+
+
+def _record_match(writer, seed, turns=80):
+    """Play random moves on a generated map, recording the Red side."""
+    rnd = random.Random(seed)
+    match = Match(generate_map("t", 18, 12, 0.2, seed), turns)
+    played = []
+    while not match.over:
+        entities = match.entities()
+        score = match.score()
+        direction = rnd.randint(1, 6)
+        duration = rnd.uniform(0.0, 2.0)
+        fallback = rnd.random() < 0.2
+        writer.record(match.game_map, entities, score, direction, duration, fallback)
+        played.append((entities, score, direction, duration, fallback))
+        match.step({"Red": direction, "Blue": rnd.randint(1, 6)})
+    return match, played
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_round_trip(tmp_path, seed):
+    with ReplayWriter("t", "Red", "DijkstraAI", f"s{seed}", tmp_path) as writer:
+        match, played = _record_match(writer, seed)
+    assert writer.dropped == 0 and writer.turns == len(played)
+
+    replay = load_replay(writer.path)
+    assert replay.team_color == "Red" and replay.model == "DijkstraAI"
+    assert replay.meta["map"] == "t" and replay.meta["session"] == f"s{seed}"
+    cmap = compile_map(match.game_map)
+    assert (replay.cmap.width, replay.cmap.height) == (cmap.width, cmap.height)
+    assert bytes(replay.cmap.passable) == bytes(cmap.passable)
+    assert len(replay.turns) == len(played)
+    for i, (turn, (entities, score, direction, duration, fallback)) in enumerate(
+        zip(replay.turns, played)
+    ):
+        assert turn.turn == i
+        assert turn.map_crc == map_crc(cmap)
+        assert turn.score == {"Red": score.get("Red", 0), "Blue": score.get("Blue", 0)}
+        assert turn.direction == direction and turn.fallback == fallback
+        assert turn.duration == pytest.approx(duration, rel=1e-6)
+        assert _key(turn.entities) == _key(entities)
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    with ReplayWriter("t", "Red", "DijkstraAI", "cut", tmp_path) as writer:
+        _, played = _record_match(writer, 7, turns=10)
+    data = writer.path.read_bytes()
+    writer.path.write_bytes(data[:-3])
+    assert len(load_replay(writer.path).turns) == len(played) - 1
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.kcr"
+    path.write_bytes(b"not a replay at all")
+    with pytest.raises(ValueError):
+        load_replay(path)
+
+
+def test_entities_without_ids(tmp_path):
+    rnd = random.Random(3)
+    match = Match(generate_map("t", 18, 12, 0.2, 3), 30)
+    played = []
+    with ReplayWriter("t", "Red", "DijkstraAI", "noid", tmp_path) as writer:
+        while not match.over:
+            entities = [dict(e, gameEntityId=None) for e in match.entities()]
+            writer.record(match.game_map, entities, match.score(), 1, 0.0)
+            played.append(entities)
+            match.step({"Red": rnd.randint(1, 6), "Blue": rnd.randint(1, 6)})
+    assert writer.dropped == 0
+
+    turns = load_replay(writer.path).turns
+    assert len(turns) == len(played)
+    for turn, entities in zip(turns, played):
+        assert _key(turn.entities) == _key(entities)
@@ -0,0 +1,51 @@
+"""Predicted states of the speculation against the game rules."""
+
+import random
+
+import pytest
+
+from kyberna_ctf.hexmap import NO_CELL
+from kyberna_ctf.maps import generate_map
+from kyberna_ctf.rules import Match
+from kyberna_ctf.speculation import predict_states
+from kyberna_ctf.state import GameState
+
+
+def _state(match):
+    return GameState.from_entities(match.entities(), "Red", match.cmap.width, match.score())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_predictions_match_rules(seed):
+    rnd = random.Random(seed)
+    match = Match(generate_map("t", 18, 12, 0.2, seed), 400)
+    first = _state(match)
+    spawns = (first.flags, first.enemy_flags)
+    while not match.over:
+        state = _state(match)
+        move = rnd.randint(1, 6)
+        predicted = predict_states(match.cmap, state, move, spawns)
+        match.step({"Red": move, "Blue": rnd.randint(1, 6)})
+        assert _state(match).key() in {guess.key() for guess in predicted}
+
+
+def test_flag_returned_by_meeting_on_its_spawn_is_picked_up_again():
+    match = Match(generate_map("t", 18, 12, 0.2, 0), 400)
+    first = _state(match)
+    spawns = (first.flags, first.enemy_flags)
+    cmap = match.cmap
+    spawn = match.flag_spawn["Blue"]
+    # Red carries Blue's flag from a neighbour of its spawn back onto it,
+    # while Blue steps onto the spawn from another neighbour.
+    (red_move, red_from), (_, blue_from) = cmap.adjacency[spawn][:2]
+    back = next(d for d, cell in cmap.adjacency[red_from] if cell == spawn)
+    blue_back = next(d for d, cell in cmap.adjacency[blue_from] if cell == spawn)
+    match.players["Red"] = red_from
+    match.players["Blue"] = blue_from
+    match.carrying["Red"] = True
+    match.flags["Blue"] = NO_CELL
+    state = _state(match)
+    predicted = predict_states(cmap, state, back, spawns)
+    match.step({"Red": back, "Blue": blue_back})
+    assert match.carrying["Red"]
+    assert _state(match).key() in {guess.key() for guess in predicted}